@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  #keep stdout valid JSON
+import pygame
+
+from camera import *
+from objects import *
+
+#Rendering benchmarks, run headless.
+#  python3 benchmark.py [--frames 120] [--n 100] [--scenes lagrange,curves,lines,trace] [--output results.json]
+#renders a fixed number of frames of each scene and reports frames/sec plus time per phase as JSON
+#(camera update, element update, draw, text, frame output), so runs can be compared against each other.
+#  python3 benchmark.py --profile trace.json
+#additionally records every update/draw/step call (see profiler.py) and writes a Chrome trace.
+#  python3 benchmark.py --curve-draw
+#compares per-segment and polyline curve drawing.
+
+phases = ['camera', 'elements', 'draw', 'text', 'output']
+
+
+def build_graph(screenSize=(1200,600)):
+    window = Window(screenSize=screenSize, headless=True)
+    camera = Camera(window=window, pos=(0.5,0.5), zoom=1)
+    canvas = Element(parent=window, pos=(0,0), dim=(1,1))
+    return canvas.add_graph(pos=(0,0), dim=(1,1), xRange=(-10,10), yRange=(-2,2))
+
+
+def time_per_call(func, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def draw_segments(curve):
+    #how Curve.draw used to work: one pygame.draw.line call per segment
+    points = np.transpose(np.array([curve.xpoints, curve.ypoints]))
+    ppixel = curve.toPixelArray(points)
+    for i in range(0, curve.res-1):
+        pygame.draw.line(curve.screen, curve.color, ppixel[i], ppixel[i+1], curve.width)
+
+
+def curve_draw(resolutions=(100,400,4000), repeats=50):
+    graph = build_graph()
+    print(f"{'res':>6} {'per segment':>14} {'polyline':>14} {'antialiased':>14}   (ms per draw)")
+    for res in resolutions:
+        curve = graph.add_curve(Curve(func=lambda x: np.sin(5*x), domain=(-10,10), res=res, width=1))
+        segments = time_per_call(lambda: draw_segments(curve), repeats)
+        polyline = time_per_call(curve.draw, repeats)
+        curve.antialias = True
+        antialiased = time_per_call(curve.draw, repeats)
+        graph.mobjects.remove(curve)
+        print(f"{res:>6} {segments*1000:>14.3f} {polyline*1000:>14.3f} {antialiased*1000:>14.3f}")
+
+
+class SyntheticScene:
+    #same frame interface as Lagrange, filled with n copies of one kind of object while the camera zooms in
+    def __init__(self, kind, n, frames, screenSize=(1200,600)):
+        self.window = Window(screenSize=screenSize, headless=True)
+        self.camera = Camera(window=self.window, pos=(0.5,0.5), zoom=1)
+        self.canvas = Element(parent=self.window, pos=(0,0), dim=(1,1))
+        self.graph = self.canvas.add_graph(pos=(0.01,0.01), dim=(0.98,0.98), xRange=(-10,10), yRange=(-10,10))
+        self.frames = frames
+        if kind == 'curves':
+            for i in range(n):
+                self.graph.add_curve(Curve(func=lambda x, phase=2*np.pi*i/n: 5*np.sin(x + phase), domain=(-10,10), res=400, color=blue))
+        elif kind == 'lines':
+            for i in range(n):
+                line = self.graph.add_line(start=(0,0), end=vec(8, 2*np.pi*i/n), color=green)
+                line.rotateBy(angle=np.pi, axis=(0,0), time=frames)
+        elif kind == 'trace':
+            trace = self.graph.add_curve(Trace(color=orange))
+            trace.set_leader(Point(pos=(0,0)))
+            angles = np.linspace(0, 20*np.pi, n)
+            trace.points = np.transpose(vec(angles/(2*np.pi), angles))  #spiral
+        else:
+            raise ValueError(f"Unknown synthetic scene '{kind}'")
+
+    def schedule(self):
+        return [(self.setup, self.frames)]
+
+    def setup(self):
+        self.camera.zoomTo(zf=2, time=self.frames)
+        self.camera.panTo(pf=(0.4,0.6), time=self.frames)
+
+    def update_camera(self):
+        self.window.timeline.update()
+        self.camera.update()
+
+    def update_elements(self):
+        for element in self.canvas.elements:
+            element.update()
+
+    def draw_elements(self):
+        self.window.screen.fill(black)
+        for element in self.canvas.elements:
+            element.draw()
+
+    def draw_text(self):
+        pass
+
+
+def build_lagrange():
+    from main import build_scene
+    return build_scene(headless=True)
+
+
+def run_scene(scene, frames, profiler=None):
+    #renders up to 'frames' frames of the scene's schedule, timing each phase separately
+    times = dict.fromkeys(phases, 0.0)
+    count = 0
+    start = time.perf_counter()
+    for segment, length in scene.schedule():
+        if count >= frames:
+            break
+        segment()
+        for i in range(min(round(length), frames - count)):
+            t0 = time.perf_counter()
+            scene.update_camera()
+            t1 = time.perf_counter()
+            scene.update_elements()
+            t2 = time.perf_counter()
+            scene.draw_elements()
+            t3 = time.perf_counter()
+            scene.draw_text()
+            t4 = time.perf_counter()
+            pygame.image.tostring(scene.window.screen, 'RGB')  #what a frame sink receives
+            t5 = time.perf_counter()
+            if profiler != None:
+                profiler.mark_frame()
+            for phase, seconds in zip(phases, (t1-t0, t2-t1, t3-t2, t4-t3, t5-t4)):
+                times[phase] += seconds
+            count += 1
+    total = time.perf_counter() - start
+    return {
+        'frames': count,
+        'seconds': total,
+        'fps': count / total,
+        'phases': {phase: {'seconds': times[phase], 'msPerFrame': 1000*times[phase]/count, 'share': times[phase]/total}
+                   for phase in phases}
+        }
+
+
+def run_suite(scenes, frames, n, profiler=None):
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'platform': platform.platform()
+            },
+        'settings': {'frames': frames, 'n': n},
+        'scenes': {}
+        }
+    for index, name in enumerate(scenes):
+        if name == 'lagrange':
+            scene = build_lagrange()
+        else:
+            scene = SyntheticScene(name, n, frames)
+        if profiler != None:
+            profiler.pid = index
+            profiler.frame = 0
+            profiler.name_process(name)
+        results['scenes'][name] = run_scene(scene, frames, profiler)
+        if profiler != None:
+            results['scenes'][name]['profile'] = profiler.summary(pid=index)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless rendering benchmarks')
+    parser.add_argument('--frames', type=int, default=120, help='frames to render per scene')
+    parser.add_argument('--n', type=int, default=100, help='number of curves/lines/trace points in the synthetic scenes')
+    parser.add_argument('--scenes', default='lagrange,curves,lines,trace', help='comma-separated list of scenes')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--profile', help='record per-object update/draw/step times and write them to this Chrome trace file')
+    parser.add_argument('--curve-draw', action='store_true', help='only run the curve drawing comparison')
+    args = parser.parse_args()
+
+    if args.curve_draw:
+        curve_draw()
+        sys.exit()
+
+    profiler = None
+    if args.profile:
+        from profiler import Profiler
+        from euler_lagrange import Variation
+        profiler = Profiler()
+        profiler.install(Variation)
+    results = run_suite(args.scenes.split(','), args.frames, args.n, profiler)
+    if profiler != None:
+        profiler.uninstall()
+        profiler.export_chrome_trace(args.profile)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
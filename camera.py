@@ -1,4 +1,5 @@
 from ratefunctions import *
+from vec2d import *
 
 class Camera:
     def __init__(self, window, pos, zoom):
@@ -7,17 +8,41 @@ class Camera:
         self.window = window
         window.camera = self
         self.currentMovements = []
+        self.transformCache = None
+        self.viewportCache = None
+
+    def getTransform(self):
+        #affine matrix from window coordinates to pixels; rebuilt only when pos/zoom change
+        key = (self.pos[0], self.pos[1], self.zoom, tuple(self.window.screenSize))
+        if self.transformCache == None or self.transformCache[0] != key:
+            topLeft = self.pos - (1/self.zoom) / 2 #top left corner of camera viewport in window frame
+            scale = np.array(self.window.screenSize) * self.zoom
+            self.transformCache = (key, affine(np.diag(scale), -scale*topLeft))
+        return self.transformCache[1]
 
     def toPixel(self, coords):
-        topLeft = self.pos - (1/self.zoom) / 2 #top left corner of camera viewport in window frame
-        newCoords = (coords - topLeft) * self.zoom #coordinate's position relative to top left in camera frame
-        return self.window.screenSize * newCoords #convert to pixels
+        return apply_affine(self.getTransform(), coords)
+
+    def getViewport(self, margin=0):
+        #visible part of the window as (xMin, yMin, xMax, yMax) in window coordinates, grown by margin pixels;
+        #asked for by every object each frame, so kept until the camera moves
+        key = (self.pos[0], self.pos[1], self.zoom, tuple(self.window.screenSize))
+        if self.viewportCache == None or self.viewportCache[0] != key:
+            self.viewportCache = (key, {})
+        viewports = self.viewportCache[1]
+        if margin not in viewports:
+            topLeft = self.pos - (1/self.zoom) / 2
+            padding = margin / (np.array(self.window.screenSize) * self.zoom)
+            viewports[margin] = (*(topLeft - padding).tolist(), *(topLeft + 1/self.zoom + padding).tolist())
+        return viewports[margin]
+
+    def schedule(self, movement):
+        self.window.timeline.add(movement, self)
 
     def panTo(self, pf, time, delay=0, ratefunc=SmoothMove()):
-        self.currentMovements.append(
+        self.schedule(
             Pan(
                 camera = self,
-                p0 = self.pos,
                 pf = pf,
                 time = time,
                 delay = delay,
@@ -26,7 +51,7 @@ class Camera:
         )
 
     def zoomTo(self, zf, time, delay=0, ratefunc=SmoothMove()):
-        self.currentMovements.append(
+        self.schedule(
             Zoom(
                 camera=self,
                 zf=zf,
@@ -39,8 +64,7 @@ class Camera:
     def update(self):
         for movement in self.currentMovements:
             movement.step()
-            if movement.t >= movement.time:
-                self.currentMovements.remove(movement)
+        self.currentMovements = [movement for movement in self.currentMovements if movement.t < movement.time]
 
 
 class Zoom:
@@ -51,35 +75,37 @@ class Zoom:
         self.time = time
         self.t = -delay
         self.ratefunc = ratefunc
+        self.progress = ratefunc.get_table(time)[1]
 
-    def zoom(self, stepsize):
-        self.camera.zoom += stepsize
+    def evaluate(self, t):
+        #sets the zoom for frame t of the movement directly, without depending on previous steps
+        if t >= 0:
+            if self.z0 == None:
+                self.z0 = self.camera.zoom
+            self.camera.zoom = self.z0 + (self.zf-self.z0)*self.ratefunc.get_progress(t, self.time, self.progress)
 
     def step(self):
         self.t += 1
-        if self.t >= 0 and self.t < self.time:
-            if self.z0 == None:
-                self.z0 = self.camera.zoom
-                self.delta_z = (self.zf-self.z0)/self.time
-            ds = self.ratefunc.get_ds(self.t, self.time)
-            self.zoom(self.delta_z*ds)
+        self.evaluate(self.t)
 
 
 class Pan:
-    def __init__(self, camera, p0, pf, time, delay=0, ratefunc=SmoothMove()):
+    def __init__(self, camera, pf, time, delay=0, ratefunc=SmoothMove()):
         self.camera = camera
-        self.p0 = np.array(p0)
+        self.p0 = None  #wait until after delay to set initial position
         self.pf = np.array(pf)
         self.time = time
         self.t = -delay
         self.ratefunc = ratefunc
-        self.delta_p = (pf-p0)/time
+        self.progress = ratefunc.get_table(time)[1]
 
-    def pan(self, stepsize):
-        self.camera.pos += stepsize
+    def evaluate(self, t):
+        #sets the position for frame t of the movement directly, without depending on previous steps
+        if t >= 0:
+            if self.p0 is None:
+                self.p0 = np.array(self.camera.pos)
+            self.camera.pos = self.p0 + (self.pf-self.p0)*self.ratefunc.get_progress(t, self.time, self.progress)
 
     def step(self):
         self.t += 1
-        if self.t >= 0 and self.t < self.time:
-            ds = self.ratefunc.get_ds(self.t, self.time)
-            self.pan(self.delta_p*ds)
+        self.evaluate(self.t)
@@ -1,25 +1,89 @@
-import cv2
+import argparse
 import os
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+#Compiles the JPEG frames written by JPEGSink (recording.py) into a video.
+#  python3 compile_video.py [--folder frames] [--fps 30] [--codec MJPG] [--container avi] [--output file]
+#Frames are decoded on a thread pool (cv2.imread releases the GIL) but written in frame order, with at
+#most 'buffer' decoded frames held in memory at a time.
+
+
+def frame_number(filename):
+    #frames are named by index (000042.jpg); anything else sorts after them by name
+    stem = os.path.splitext(filename)[0]
+    return (0, int(stem), '') if stem.isdigit() else (1, 0, filename)
+
+
+def list_frames(folder):
+    images = [img for img in os.listdir(folder) if img.endswith('.jpg')]
+    return [os.path.join(folder, img) for img in sorted(images, key=frame_number)]
+
+
+def read_frames(paths, threads=None, buffer=64):
+    #yields the decoded frames in order, keeping at most 'buffer' reads in flight
+    with ThreadPoolExecutor(threads) as pool:
+        pending = deque()
+        paths = iter(paths)
+        for path in paths:
+            pending.append(pool.submit(cv2.imread, path))
+            if len(pending) >= buffer:
+                break
+        while pending:
+            frame = pending.popleft().result()
+            for path in paths:  #refill one slot
+                pending.append(pool.submit(cv2.imread, path))
+                break
+            yield frame
+
 
-print('Compiling video...')
+def get_fourcc(codec):
+    #a four character code like 'MJPG' or 'mp4v', or '0' for uncompressed frames
+    if codec == '0':
+        return 0
+    if len(codec) != 4:
+        raise ValueError(f"Codec must be a four character code or '0', got '{codec}'")
+    return cv2.VideoWriter_fourcc(*codec)
 
-image_folder = 'frames'
-video_name = f'videos/anim_{round(time.time())}.avi'
 
-images = sorted([img for img in os.listdir(image_folder) if img.endswith(".jpg")])
-frame = cv2.imread(os.path.join(image_folder, images[0]))
-height, width, layers = frame.shape
+def compile_video(folder='frames', output=None, fps=30, codec='MJPG', container='avi', threads=None, buffer=64):
+    paths = list_frames(folder)
+    if not paths:
+        raise FileNotFoundError(f"No .jpg frames in '{folder}'")
+    if output == None:
+        output = f'videos/anim_{round(time.time())}.{container}'
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
 
-video = cv2.VideoWriter(video_name, 0, 30, (width,height))
+    video = None
+    for frame in read_frames(paths, threads, buffer):
+        if frame is None:
+            raise IOError('Could not read a frame from ' + folder)
+        if video == None:
+            height, width, layers = frame.shape
+            video = cv2.VideoWriter(output, get_fourcc(codec), fps, (width,height))
+            if not video.isOpened():
+                raise IOError(f"Could not open '{output}' for writing with codec '{codec}'")
+        video.write(frame)
+    video.release()
+    return output
 
-for image in images:
-    video.write(cv2.imread(os.path.join(image_folder, image)))
 
-cv2.destroyAllWindows()
-video.release()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile rendered frames into a video')
+    parser.add_argument('--folder', default='frames', help='folder with the numbered .jpg frames')
+    parser.add_argument('--output', help='video file to write (default videos/anim_<time>.<container>)')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--codec', default='MJPG', help="fourcc, e.g. MJPG, XVID, mp4v, or 0 for uncompressed")
+    parser.add_argument('--container', default='avi', help='file extension used for the default output name')
+    parser.add_argument('--threads', type=int, default=None, help='decoding threads (default: chosen by Python)')
+    parser.add_argument('--buffer', type=int, default=64, help='most decoded frames held in memory at once')
+    args = parser.parse_args()
 
-print('Video compiled.')
+    print('Compiling video...')
+    output = compile_video(args.folder, args.output, args.fps, args.codec, args.container, args.threads, args.buffer)
+    print(f'Video compiled: {output}')
 
-#os.system('rm -r frames')
-#os.system('mkdir frames')
+    #os.system('rm -r frames')
+    #os.system('mkdir frames')
@@ -1,5 +1,6 @@
-from animFW import *
-import time
+from camera import *
+from objects import *
+from recording import *
 
 """
 #initialize clock
@@ -29,13 +30,50 @@ myCanvas = Element(
 
 # Move into window or canvas class in the future
 def show_text(surface, text, pos, font_name="freesansbold.ttf", font_size=25, font_col=white):
-    font = pygame.font.Font(font_name, font_size)
-    text_obj = font.render(text, True, font_col)
-    text_size = font.size(text)
+    text_obj = render_text(text, get_font(font_name, font_size), tuple(font_col))  #cached, see game_tools.py
+    text_size = text_obj.get_size()
     surface.getScreen().blit(text_obj, (pos[0]-int(text_size[0]/2), pos[1]-int(text_size[1]/2)))
 
 
 
+actionTables = {}  #memoized action landscapes, keyed by path function, eta, domain, res and parameter values
+
+
+def path_lagrangian(xpoints, ypoints):
+    #Lagrangian along paths sampled at xpoints; ypoints holds one path, or one path per row
+    U = ypoints[...,1:-1]  #particle of mass 1 in gravitational field in -y direction
+    v = (ypoints[...,2:]-ypoints[...,:-2]) / (xpoints[2:]-xpoints[:-2])
+    K = 0.5*1*v**2  #kinetic energy
+    lagr = K-U
+    return np.concatenate((lagr[...,:1], lagr, lagr[...,-1:]), axis=-1) #pad start and end values to match dimension of xpoints
+
+
+def path_actions(func, eta, domain, res, eps=0, a=0, b=0, chunkSize=2048):
+    #action of the varied paths func(x) + eps*eta(x,a,b) for broadcastable arrays of eps, a and b, evaluated as
+    #(paths, res) batches of at most chunkSize paths; gives the same values as LCurve.getAction for each path
+    xpoints = np.linspace(domain[0], domain[1], res)
+    eps, a, b = np.broadcast_arrays(eps, a, b)
+    shape = eps.shape
+    eps, a, b = eps.ravel(), a.ravel(), b.ravel()
+    base = func(xpoints)
+    dt = (domain[1]-domain[0])/res
+    actions = np.empty(len(eps))
+    for start in range(0, len(eps), chunkSize):
+        chunk = slice(start, start+chunkSize)
+        variation = np.broadcast_to(eta(xpoints, a[chunk,None], b[chunk,None]), (len(eps[chunk]), res))
+        actions[chunk] = np.sum(path_lagrangian(xpoints, base + eps[chunk,None]*variation), axis=-1)*dt
+    return actions.reshape(shape)
+
+
+def action_landscape(func, eta, domain, res, epsValues, aValues=0, bValues=0):
+    #action over the grid of all combinations of the given eps, a and b values, shape (eps, a, b); memoized
+    epsValues, aValues, bValues = (np.atleast_1d(np.asarray(values, dtype=float)) for values in (epsValues, aValues, bValues))
+    key = (func, eta, tuple(domain), res, epsValues.tobytes(), aValues.tobytes(), bValues.tobytes())
+    if key not in actionTables:
+        actionTables[key] = path_actions(func, eta, domain, res, *np.meshgrid(epsValues, aValues, bValues, indexing='ij'))
+    return actionTables[key]
+
+
 class LCurve(Curve):
     params = {
         'func': lambda x: x,
@@ -46,46 +84,70 @@ class LCurve(Curve):
         'domain': (-5, 5),
         'color': green,
         'width': 3,
-        'res': 100
+        'res': 100,
+        'antialias': False,
+        'adaptive': False,
+        'tolerance': 0.5,
+        'maxRes': 2000,
+        'precompute': False  #compute the action of every frame of a variation in one batch when it is scheduled
     }
 
+    def __init__(self, parent=None, **kwargs):
+        self.lagrangianCache = None  #(pathKey, lagrangian, action) for the path currently in xpoints/ypoints
+        self.actionTable = {}  #pathKey -> action, filled by Variation.precompute
+        Curve.__init__(self, parent, **kwargs)
+
     def getLagrangian(self, xvals, scale=1):
         if xvals.size != self.xpoints.size:
             print("Array supplied to Lagrangian function has incorrect dimension. Check that the domain and resolution are the same as for the position curve.")
             raise SystemExit
-
-        lagr = []
-        for i,x in enumerate(xvals[1:-1]):
-            j = i+1  #account for shift from starting at index 1
-            U = self.ypoints[j]  #particle of mass 1 in gravitational field in -y direction
-            v = (self.ypoints[j+1]-self.ypoints[j-1]) / (self.xpoints[j+1]-self.xpoints[j-1])
-            K = 0.5*1*v**2  #kinetic energy
-            lagr.append(K-U)
-        lagr.insert(0, lagr[0]) #pad start and end values to match dimension of xpoints
-        lagr.append(lagr[-1])
-        return np.array(lagr)*scale
+        return self.getPathQuantities()[0]*scale
 
     def getAction(self):
-        lagr = self.getLagrangian(self.xpoints)
-        dt = (self.domain[1]-self.domain[0])/self.res
-        return np.sum(lagr)*dt
+        if self.pathKey in self.actionTable:  #played back from a precomputed variation
+            return self.actionTable[self.pathKey]
+        return self.getPathQuantities()[1]
+
+    def getActionLandscape(self, eta, epsValues, aValues=0, bValues=0):
+        #action of this curve's path varied by eta over a grid of parameters, see action_landscape
+        return action_landscape(self.func, eta, self.domain, self.res, epsValues, aValues, bValues)
+
+    def getPathQuantities(self):
+        #Lagrangian and action are only recomputed when the path itself has changed
+        if self.lagrangianCache == None or self.lagrangianCache[0] != self.pathKey:
+            lagr = path_lagrangian(self.xpoints, self.ypoints)
+            dt = (self.domain[1]-self.domain[0])/self.res
+            self.lagrangianCache = (self.pathKey, lagr, np.sum(lagr)*dt)
+        return self.lagrangianCache[1:]
 
     def varyBy(self, eta, time, epsRange=None, aRange=None, bRange=None, delay=0, ratefunc=SmoothMove()):
-        self.currentMovements.append(
-            Variation(
-                parent=self,
-                eta=eta,
-                epsRange=epsRange,
-                aRange=aRange,
-                bRange=bRange,
-                time=time,
-                delay=delay,
-                ratefunc=ratefunc
-            )
+        variation = Variation(
+            parent=self,
+            eta=eta,
+            epsRange=epsRange,
+            aRange=aRange,
+            bRange=bRange,
+            time=time,
+            delay=delay,
+            ratefunc=ratefunc
         )
+        if self.precompute:
+            variation.precompute()
+        self.schedule(variation)
+
+    def evaluate(self, x):
+        #the path saved in pathKey when the grid was last sampled: move() runs after the sampling, so the live
+        #eps/a/b already belong to the next frame by the time the curve is drawn
+        func, eta, eps, a, b = self.pathKey[:5]
+        return func(x) + eps*eta(x, a, b)
+
     def update(self):
-        self.xpoints = np.linspace(self.domain[0], self.domain[1], self.res)
-        self.ypoints = self.func(self.xpoints) + self.eps*self.eta(self.xpoints, self.a, self.b)
+        #xpoints/ypoints stay on the res grid the Lagrangian and action are computed on, even when drawn adaptively
+        if self.needsUpdate():
+            self.pathKey = (self.func, self.eta, self.eps, self.a, self.b, tuple(self.domain), self.res)
+            self.xpoints = np.linspace(self.domain[0], self.domain[1], self.res)
+            self.ypoints = self.evaluate(self.xpoints)
+            self.markClean()
         Mobject.update(self)
 
 
@@ -99,39 +161,56 @@ class Variation:
         self.time = time
         self.delay = delay
         self.ratefunc = ratefunc
+        self.progress = ratefunc.get_table(time)[1]
         if epsRange != None:
             self.parent.eps = epsRange[0]
-            self.delta_eps = (epsRange[1]-epsRange[0])/self.time
-        else:
-            self.delta_eps = 0
         if aRange != None:
             self.parent.a = aRange[0]
-            self.delta_a = (aRange[1]-aRange[0])/self.time
-        else:
-            self.delta_a = 0
         if bRange != None:
             self.parent.b = bRange[0]
-            self.delta_b = (bRange[1]-bRange[0])/self.time
-        else:
-            self.delta_b = 0
         self.t = -self.delay
 
-    def vary(self, eps_inc, a_inc, b_inc):
-        self.parent.eps += eps_inc
-        self.parent.a += a_inc
-        self.parent.b += b_inc
+    def vary(self, s):
+        #parameters without a range are left alone
+        if self.epsRange != None:
+            self.parent.eps = self.epsRange[0] + (self.epsRange[1]-self.epsRange[0])*s
+        if self.aRange != None:
+            self.parent.a = self.aRange[0] + (self.aRange[1]-self.aRange[0])*s
+        if self.bRange != None:
+            self.parent.b = self.bRange[0] + (self.bRange[1]-self.bRange[0])*s
+
+    def valueAt(self, t):
+        #(eps, a, b) the curve will have at frame t of the variation, for a frame or an array of frames;
+        #parameters without a range keep the curve's current values
+        s = np.array([self.ratefunc.get_progress(frame, self.time, self.progress) for frame in np.ravel(t)]).reshape(np.shape(t))
+        return tuple(values[0] + (values[1]-values[0])*s if values != None else np.full(np.shape(t), current)
+                     for values, current in ((self.epsRange, self.parent.eps), (self.aRange, self.parent.a), (self.bRange, self.parent.b)))
+
+    def precompute(self):
+        #computes the action for every frame this variation will be evaluated at in one batch, so the curve's
+        #getAction (and the point following it) plays them back instead of summing each path as it's drawn
+        parent = self.parent
+        frames = self.t + np.arange(1, int(np.ceil(self.time - self.t)) + 1)  #t after each step()
+        frames = frames[frames >= 0]
+        eps, a, b = self.valueAt(frames)
+        actions = path_actions(parent.func, parent.eta, parent.domain, parent.res, eps, a, b)
+        parent.actionTable = {(parent.func, parent.eta, eps[i], a[i], b[i], tuple(parent.domain), parent.res): actions[i]
+                              for i in range(len(frames))}
+
+    def evaluate(self, t):
+        #sets the curve's parameters for frame t of the variation directly, without depending on previous steps
+        if t >= 0:
+            self.vary(self.ratefunc.get_progress(t, self.time, self.progress))
 
     def step(self):
         self.t += 1
-        if self.t >= 0:
-            ds = self.ratefunc.get_ds(self.t, self.time)
-            self.vary(self.delta_eps*ds, self.delta_a*ds, self.delta_b*ds)
+        self.evaluate(self.t)
 
 
 
 
 class Lagrange:
-    def __init__(self, window, canvas, camera, func, srange, fps, clock, record=False):
+    def __init__(self, window, canvas, camera, func, srange, fps, clock, record=False, sink=None, precompute=False):
         #set assumed path y(x) and range for action plot (this is a little janky)
         self.window = window
         self.canvas = canvas
@@ -141,6 +220,9 @@ class Lagrange:
         self.fps = fps
         self.clock = clock
         self.record = record
+        if self.record and sink == None:
+            sink = JPEGSink('frames')  #written inline; a ThreadedSink is up to the caller, who has to close() it (see main.py)
+        self.sink = sink  #receives every rendered frame (see recording.py)
         #initialize subcanvases/scene elements
         self.graph_pos = canvas.add_graph(
             pos = (0.01, 0.01),   #as fraction of full width/height
@@ -179,7 +261,9 @@ class Lagrange:
                 domain = (0,5),
                 color = blue,
                 width = 2,
-                res = 400
+                res = 400,
+                adaptive = True,
+                precompute = precompute
             )
         )
         self.curve_lagr = self.graph_lagr.add_curve(
@@ -191,11 +275,13 @@ class Lagrange:
                 res = 400
             )
         )
+        self.curve_lagr.dependsOn(self.curve_pos)
 
         self.point_act = Point(
             func = lambda x: np.array([self.curve_pos.eps, self.curve_pos.getAction()]),
             radius = 3
         )
+        self.point_act.dependsOn(self.curve_pos)
 
         self.curve_act = self.graph_act.add_curve(
             Trace(
@@ -327,48 +413,99 @@ class Lagrange:
             delay=1.5*1*self.fps
         )
 
+    def update_camera(self):
+        self.window.timeline.update()
+        self.camera.update()
+
+    def update_elements(self):
+        for element in self.canvas.elements:
+            element.update()
+
+    def update_frame(self):
+        #advances the scene by one frame without drawing anything
+        self.update_camera()
+        self.update_elements()
+
+    def draw_elements(self):
+        self.window.screen.fill(black)
+        for element in self.canvas.elements:
+            element.draw()
+
+    def draw_text(self):
+        show_text(self.canvas, "Action: {}".format(round(self.curve_pos.getAction())), np.array(self.window.screenSize)*np.array([0.87,0.10]))
+        show_text(self.canvas, "x", self.graph_pos.toPixel((-0.3,19)))
+        show_text(self.canvas, "t", self.graph_pos.toPixel((5.5,-1)))
+        show_text(self.canvas, "L", self.graph_lagr.toPixel((-0.3,19)))
+        show_text(self.canvas, "t", self.graph_lagr.toPixel((5.5,-1)))
+        show_text(self.canvas, "S", self.graph_act.toPixel((-0.5,25)))
+        show_text(self.canvas, "epsilon", self.graph_act.toPixel((6,4)))
+
+    def draw_frame(self):
+        self.draw_elements()
+        self.draw_text()
+
     def show(self, frames):
         for i in range(round(frames)):
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    raise SystemExit
-            self.window.screen.fill(black)
-            self.camera.update()
-            for element in self.canvas.elements:
-                element.update()
-                element.draw()
-            show_text(self.canvas, "Action: {}".format(round(self.curve_pos.getAction())), np.array(self.window.screenSize)*np.array([0.87,0.10]))
-            show_text(self.canvas, "x", self.graph_pos.toPixel((-0.3,19)))
-            show_text(self.canvas, "t", self.graph_pos.toPixel((5.5,-1)))
-            show_text(self.canvas, "L", self.graph_lagr.toPixel((-0.3,19)))
-            show_text(self.canvas, "t", self.graph_lagr.toPixel((5.5,-1)))
-            show_text(self.canvas, "S", self.graph_act.toPixel((-0.5,25)))
-            show_text(self.canvas, "epsilon", self.graph_act.toPixel((6,4)))
-
-            pygame.display.flip()
-            self.clock.tick(self.fps)
-
-            if self.record:
-                pygame.image.save(self.window.screen, f'frames/{round(time.time()*1000)}.jpg')
-
-    def play(self):
-        self.seg1()
-        self.show(2*self.fps)
-        self.seg2()
-        self.show(1.5*1*self.fps)
-        self.seg3()
-        self.show(1.5*2*self.fps)
-        self.seg4()
-        self.show(1.5*2*self.fps)
-        self.seg5()
-        self.show(1.5*1*self.fps)
-        self.seg6()
-        self.show(1.5*1*self.fps)
-        self.seg7()
-        self.show(1.5*1*self.fps)
-        self.seg8()
-        self.show(1.5*3*self.fps)
+            self.window.handle_events()
+            self.update_frame()
+            self.draw_frame()
+
+            self.window.flip()
+            if not self.window.headless:
+                self.clock.tick(self.fps)  #headless renders run as fast as possible
+
+            if self.sink != None:
+                self.sink.write(self.window.screen)
+
+    def replay(self, frames):
+        #plays back cached (data, size) frames; the scene is still updated so later segments start from the right state
+        for data, size in frames:
+            self.window.handle_events()
+            self.update_frame()
+            if not self.window.headless:
+                self.window.screen.blit(pygame.image.fromstring(data, size, 'RGB'), (0,0))
+                self.window.flip()
+                self.clock.tick(self.fps)
+
+            if self.sink != None:
+                self.sink.write_frame(data, size)
+
+    def schedule(self):
+        #(segment setup, number of frames to show afterwards), in playback order
+        return [
+            (self.seg1, 2*self.fps),
+            (self.seg2, 1.5*1*self.fps),
+            (self.seg3, 1.5*2*self.fps),
+            (self.seg4, 1.5*2*self.fps),
+            (self.seg5, 1.5*1*self.fps),
+            (self.seg6, 1.5*1*self.fps),
+            (self.seg7, 1.5*1*self.fps),
+            (self.seg8, 1.5*3*self.fps)
+        ]
+
+    def play(self, cache=None):
+        #with a SegmentCache (render_cache.py), segments whose inputs haven't changed since an earlier run are
+        #played back from disk instead of being drawn again
+        key = None
+        for segment, frames in self.schedule():
+            segment()
+            if cache == None:
+                self.show(frames)
+                continue
+            key = cache.get_key(self, segment, frames, key)
+            if cache.has(key):
+                self.replay(cache.read(key))
+                continue
+            sink = self.sink
+            self.sink = cache.recorder(key, sink)
+            try:
+                self.show(frames)
+            except BaseException:
+                self.sink.abort()
+                raise
+            finally:
+                recorder, self.sink = self.sink, sink
+            recorder.close()
 
         self.curve_act.points = self.curve_act.points[:2] #reset point list in case of multiple run-throughs
 
@@ -1,5 +1,6 @@
 import pygame
 import numpy as np
+from functools import lru_cache
 
 pygame.font.init()
 
@@ -78,6 +79,39 @@ def RGBtoHSV(color):
         v = 1
     return np.array([h,s,v])
 
+#array versions of the two conversions above, for (...,3) arrays of colors; they follow the same
+#edge-case handling (h below 0 is treated as the first sector, out-of-range results are clamped)
+hsvSectors = np.array([[0,1,2], [1,0,2], [2,0,1], [2,1,0], [1,2,0], [0,2,1]])  #indices into (c, x, 0) for r, g, b
+
+def HSVtoRGB_array(colors):
+    colors = np.asarray(colors, dtype=float)
+    h, s, v = colors[...,0], colors[...,1], colors[...,2]
+    c = v*s
+    x = c*(1-abs((h/60) % 2 - 1))
+    m = v - c
+    sector = np.clip(np.floor(h/60), 0, 5).astype(int)
+    options = np.stack([c, x, np.zeros_like(c)], axis=-1)
+    rgb = np.take_along_axis(options, hsvSectors[sector], axis=-1)
+    return np.round((rgb + m[...,None]) * 255).astype(int)
+
+def RGBtoHSV_array(colors):
+    rgb = np.asarray(colors, dtype=float) / 255
+    rp, gp, bp = rgb[...,0], rgb[...,1], rgb[...,2]
+    cMax = rgb.max(axis=-1)
+    cMin = rgb.min(axis=-1)
+    delta = cMax - cMin
+    safeDelta = np.where(delta == 0, 1, delta)
+
+    h = np.where(cMax == rp, 60 * (((gp - bp)/safeDelta) % 6),
+        np.where(cMax == gp, 60 * (((bp - rp)/safeDelta) + 2),
+                             60 * (((rp - gp)/safeDelta) + 4)))
+    h = np.where(delta == 0, 0, h)
+    s = np.where(cMax == 0, 0, delta / np.where(cMax == 0, 1, cMax))
+    v = cMax
+
+    h = np.where(h < 0, 0, np.where(h > 360, h % 360, h))
+    return np.stack([h, np.clip(s, 0, 1), np.clip(v, 0, 1)], axis=-1)
+
 class Button(object):
     def __init__(self, text, pos, dim, on=True, col=black, text_col=white, size=15, font="freesansbold.ttf"):
         self.text = text
@@ -86,7 +120,7 @@ class Button(object):
         self.on = on
         self.col = col
         self.text_col = text_col
-        self.font = pygame.font.Font(font,size)
+        self.font = get_font(font,size)
         self.button = pygame.rect.Rect(self.pos, self.dim)
         self.border = pygame.rect.Rect(self.pos-1, self.dim+2)
 
@@ -154,15 +188,38 @@ class Slider(object):
 
 
 
+@lru_cache(maxsize=None)
+def get_font(name="freesansbold.ttf", size=15):
+    #loading a font from disk is slow, so each (name, size) is only loaded once
+    return pygame.font.Font(name, size)
+
+@lru_cache(maxsize=256)
+def render_text(text, font, col):
+    #col has to be a tuple; the returned surface is shared, so don't draw on it
+    return font.render(text, True, col)
+
+def text_cache_info():
+    info = render_text.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'hitRate': info.hits / lookups if lookups > 0 else 0,
+        'fonts': get_font.cache_info().currsize
+        }
+
 def show_text(surface, text, pos, size=15, col=black, font="freesansbold.ttf"):
     if type(font) == str:
-        font = pygame.font.Font(font,size)
-    text = font.render(text, True, col)
+        font = get_font(font,size)
+    text = render_text(text, font, tuple(col))
     surface.blit(text, pos)
 
 def save(filename, objects):
-    pickle.dump(objects, open(filename+".p", "wb"))
-    print("Objects saved in "+filename+".p\n")
+    from scene_io import save_scene  #imported here so game_tools doesn't depend on the scene format
+    save_scene(filename+".scene", objects)
+    print("Objects saved in "+filename+".scene\n")
 
 def load(filename):
-    return pickle.load(open(filename+".p", "rb"))
+    from scene_io import load_scene
+    return load_scene(filename+".scene")
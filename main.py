@@ -9,52 +9,94 @@ from objects import *
 from transformations import *
 from ratefunctions import *
 from euler_lagrange import *
+from recording import *
+from parallel import *
+from render_cache import *
 
 #recording parameters
 record = True
+output = 'jpeg'  #'jpeg' saves frames/ for compile_video.py; 'opencv' and 'ffmpeg' encode straight to videos/
 compile_video = True
+writerThreads = 1  #encode and save frames on background threads while the next frame renders (0 to write inline,
+                   #more than one only with output = 'jpeg')
+headless = False  #render offscreen without a display or real-time frame cap
+
+#segments whose inputs are unchanged since an earlier run are played back from this folder instead of
+#being rendered again (see render_cache.py); None renders everything
+cacheFolder = None
+
+#parallel rendering (workers > 1 renders headless in separate processes)
+workers = 1
 
 #initialize clock
 fps = 30
 clock = pygame.time.Clock()
 
-#initialize window
-myWindow = Window(
-    screenSize = (1200,600)  #size in pixels
-)
-
-#initialize camera
-myCam = Camera(
-    window=myWindow,
-    pos=(0.50, 0.50),
-    zoom=1.00
-)
-
-#initialize main canvas
-myCanvas = Element(
-    parent = myWindow,
-    pos = (0,0),
-    dim = (1,1)
-)
-
-
-testPath = Lagrange(window=myWindow, canvas=myCanvas, camera=myCam, func=lambda x: np.sin(5*x)+15-2.8*x, srange=(0,120), fps=fps, clock=clock, record=record)
-testPath.play()
-print("Finished running test path")
-
-##truePath = Lagrange(func=lambda x: -0.5*x**2 + 15, srange=(-50,30))
-##truePath.play()
-##del(truePath)
-##print("Finished running true path")
-
-print("Scene complete")
-
-if record and compile_video:
-    os.system('python3 compile_video.py')
-
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            raise SystemExit
-    time.sleep(0.1)
+
+def testPathFunc(x):
+    return np.sin(5*x)+15-2.8*x
+
+
+def build_scene(headless=True, sink=None):
+    #initialize window
+    myWindow = Window(
+        screenSize = (1200,600),  #size in pixels
+        headless = headless
+    )
+
+    #initialize camera
+    myCam = Camera(
+        window=myWindow,
+        pos=(0.50, 0.50),
+        zoom=1.00
+    )
+
+    #initialize main canvas
+    myCanvas = Element(
+        parent = myWindow,
+        pos = (0,0),
+        dim = (1,1)
+    )
+
+    return Lagrange(window=myWindow, canvas=myCanvas, camera=myCam, func=testPathFunc, srange=(0,120), fps=fps, clock=clock, sink=sink)
+
+
+if __name__ == '__main__':
+    #initialize frame output
+    sink = None
+    if record:
+        if output == 'opencv':
+            sink = VideoWriterSink(f'videos/anim_{round(time.time())}.avi', fps=fps)
+        elif output == 'ffmpeg':
+            sink = FFmpegSink(f'videos/anim_{round(time.time())}.mp4', fps=fps)
+        else:
+            sink = JPEGSink('frames')
+        if writerThreads > 0:
+            sink = ThreadedSink(sink, workers=writerThreads)
+
+    if workers > 1:
+        headless = True
+        render_parallel(build_scene, sink, workers)
+    else:
+        testPath = build_scene(headless=headless, sink=sink)
+        testPath.play(cache=SegmentCache(cacheFolder) if cacheFolder != None else None)
+    if sink != None:
+        sink.close()
+    print("Finished running test path")
+
+    ##truePath = Lagrange(func=lambda x: -0.5*x**2 + 15, srange=(-50,30))
+    ##truePath.play()
+    ##del(truePath)
+    ##print("Finished running true path")
+
+    print("Scene complete")
+
+    if record and output == 'jpeg' and compile_video:
+        os.system(f'python3 compile_video.py --fps {fps}')
+
+    while not headless:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                raise SystemExit
+        time.sleep(0.1)
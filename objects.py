@@ -1,16 +1,61 @@
 from ratefunctions import *
 from vec2d import *
 from game_tools import *
+from transformations import *
+from timeline import *
+from pygame import gfxdraw
+
+def draw_polyline(surface, color, points, width=1, antialias=False):
+    #draws an (N,2) array of pixel coordinates as one connected line in a single call
+    if antialias and width <= 1:
+        pygame.draw.aalines(surface, color, False, points)  #aalines has no width, so only 1px lines are antialiased
+    else:
+        pygame.draw.lines(surface, color, False, points, width)
+
+def screen_bounds(surface, margin=0):
+    #pixel bounds of a surface, grown by margin pixels
+    width, height = surface.get_size()
+    return (-margin, -margin, width + margin, height + margin)
+
+
+identityTransform = np.identity(3)  #window coordinates relative to the window itself
+
 
 class Window:
-    def __init__(self, screenSize):
+    def __init__(self, screenSize, headless=False):
+        #headless windows draw into an in-memory surface (no display needed, no vsync/event handling)
         self.screenSize = screenSize
-        self.screen = pygame.display.set_mode(screenSize)
+        self.headless = headless
+        if self.headless:
+            self.screen = pygame.Surface(screenSize)
+        else:
+            self.screen = pygame.display.set_mode(screenSize)
+        self.timeline = Timeline()  #schedules the movements of everything in this window
+    def handle_events(self):
+        if self.headless:
+            return
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                raise SystemExit
+    def flip(self):
+        if not self.headless:
+            pygame.display.flip()
+    def getTransform(self):
+        return self.camera.getTransform()
+    def getWindowTransform(self):
+        return identityTransform
+    def getViewport(self, margin=0):
+        return self.camera.getViewport(margin)
     def toPixel(self, coords):
         #takes in (width, height) as fraction of total size and returns pixel coordinates
         return self.camera.toPixel(coords)
+    def toPixelArray(self, points):
+        return self.toPixel(points).astype(int)
     def getScreen(self):
         return self.screen
+    def getTimeline(self):
+        return self.timeline
 
 
 class Element:
@@ -21,12 +66,51 @@ class Element:
         self.dim = dim
         self.elements = [] #contains subelements
         self.mobjects = [] #contains mobjects
+        self.transformCache = None
+        self.windowTransformCache = None
+    cullMargin = 8  #pixels added around bounding boxes when culling, covers line widths and antialiasing
     def toParentCoords(self, coords):
         return self.pos + coords * self.dim
+    def getTransformKey(self):
+        return (tuple(self.pos), tuple(self.dim))
+    def getLocalTransform(self):
+        #affine form of toParentCoords
+        return affine(np.diag(self.dim), self.pos)
+    def getTransform(self):
+        #composed matrix from local coordinates to pixels, rebuilt only when this element or one of its parents changes
+        parentTransform = self.parent.getTransform()
+        key = self.getTransformKey()
+        if (self.transformCache == None or self.transformCache[0] is not parentTransform
+                or self.transformCache[1] != key):
+            self.transformCache = (parentTransform, key, np.dot(parentTransform, self.getLocalTransform()))
+        return self.transformCache[2]
+    def getWindowTransform(self):
+        #like getTransform, but to window coordinates, so it doesn't change when the camera moves
+        parentTransform = self.parent.getWindowTransform()
+        key = self.getTransformKey()
+        if (self.windowTransformCache == None or self.windowTransformCache[0] is not parentTransform
+                or self.windowTransformCache[1] != key):
+            self.windowTransformCache = (parentTransform, key, np.dot(parentTransform, self.getLocalTransform()))
+        return self.windowTransformCache[2]
+    def getViewport(self, margin=0):
+        return self.parent.getViewport(margin)
+    def getLocalBounds(self):
+        return (0, 0, 1, 1)
+    def getBounds(self):
+        #window coordinate bounding box of this element and everything in it (None if something's bounds are unknown)
+        return bounds_union([transform_bounds(self.getWindowTransform(), self.getLocalBounds())]
+                            + [child.getBounds() for child in self.elements + self.mobjects])
+    def isVisible(self):
+        return bounds_overlap(self.getBounds(), self.getViewport(self.cullMargin))
     def toPixel(self, coords):
-        return self.parent.toPixel(self.toParentCoords(coords))
+        return apply_affine(self.getTransform(), coords)
+    def toPixelArray(self, points):
+        #converts an (N,2) array of local coordinates to integer pixel coordinates in one call
+        return self.toPixel(points).astype(int)
     def getScreen(self):
         return self.parent.getScreen()
+    def getTimeline(self):
+        return self.parent.getTimeline()
     def add_graph(self, pos, dim, **kwargs):
         graph = Graph(self, pos, dim, **kwargs)
         self.elements.append(graph)
@@ -37,10 +121,14 @@ class Element:
         for mobject in self.mobjects:
             mobject.update()
     def draw(self):
+        #elements and mobjects entirely outside the camera viewport are skipped
+        if not self.isVisible():
+            return
         for element in self.elements:
             element.draw()
         for mobject in self.mobjects:
-            mobject.draw()
+            if mobject.isVisible():
+                mobject.draw()
 
 class Mobject:
     def __init__(self, parent, **kwargs):
@@ -48,28 +136,115 @@ class Mobject:
         if self.parent != None: self.screen = parent.getScreen()
         self.currentMovements = []
         self.mobjects = []
+        self.dirty = True  #set whenever a param changes; update() only recomputes geometry while dirty
+        self.version = 0  #incremented every time the geometry is recomputed
+        self.dependencies = []
+        self.dependencyVersions = []
+        self.basePoints = None  #pointlist before the running geometric movements (see move)
+        self.bakedTransform = None  #combined matrix of geometric movements that finished while others were running
+        self.boundsCache = None  #(window transform, bounds key, bounds) of this object without its mobjects
         self.params.update(kwargs)
         for name, value in self.params.items():
             if type(value) == list or type(value) == tuple:
                 value = np.array(value)
             setattr(self, name, value)
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in self.params:
+            object.__setattr__(self, 'dirty', True)
+    def setDirty(self):
+        #for changes setattr can't see, e.g. in-place edits of a param array
+        self.dirty = True
+    def dependsOn(self, *mobjects):
+        #for objects whose func reads another object's state: recompute whenever those objects do
+        self.dependencies.extend(mobjects)
+    def needsUpdate(self):
+        return self.dirty or [mobject.version for mobject in self.dependencies] != self.dependencyVersions
+    def markClean(self):
+        self.dirty = False
+        self.version += 1
+        self.dependencyVersions = [mobject.version for mobject in self.dependencies]
     def setParent(self, parent):
         self.parent = parent
         self.screen = parent.getScreen()
     def getScreen(self):
         return self.parent.getScreen()
+    def getTimeline(self):
+        if self.parent == None:
+            return None
+        return self.parent.getTimeline()
+    def getTransform(self):
+        return self.parent.getTransform()
+    def getWindowTransform(self):
+        return self.parent.getWindowTransform()
+    def getViewport(self, margin=0):
+        return self.parent.getViewport(margin)
+    def getLocalViewport(self, margin=None):
+        #viewport in this object's coordinates (a bounding box of it if the transform rotates)
+        if margin == None:
+            margin = self.getCullMargin()
+        return transform_bounds(np.linalg.inv(self.getWindowTransform()), self.getViewport(margin))
+    def getLocalBounds(self):
+        #(xMin, yMin, xMax, yMax) in local coordinates; None means unknown, so the object is never culled
+        return None
+    def getBoundsKey(self):
+        #changes whenever getLocalBounds would; version counts geometry updates
+        return self.version
+    def getBounds(self):
+        #window coordinate bounding box, only recomputed when the geometry or a parent element's transform changes
+        transform = self.getWindowTransform()
+        key = self.getBoundsKey()
+        if self.boundsCache == None or self.boundsCache[0] is not transform or self.boundsCache[1] != key:
+            self.boundsCache = (transform, key, transform_bounds(transform, self.getLocalBounds()))
+        if not self.mobjects:
+            return self.boundsCache[2]
+        return bounds_union([self.boundsCache[2]] + [mobject.getBounds() for mobject in self.mobjects])
+    cullMargin = 8
+    def getCullMargin(self):
+        return self.cullMargin
+    def isVisible(self):
+        return bounds_overlap(self.getBounds(), self.getViewport(self.getCullMargin()))
     def toPixel(self, coords):
         return self.parent.toPixel(coords)
+    def toPixelArray(self, points):
+        return self.parent.toPixelArray(points)
     def move(self):
+        #geometric movements (those with a 'matrix') are composed into one affine transform per frame and applied
+        #to self.pointlist as a single matrix multiply
+        transform = None
+        finished = []
         for movement in self.currentMovements:
             movement.step()
-            if movement.t >= movement.time:
-                self.currentMovements.remove(movement)
+            matrix = getattr(movement, 'matrix', None)
+            if matrix is not None:
+                transform = matrix if transform is None else np.dot(matrix, transform)
+            if movement.t >= movement.time and matrix is not None:
+                finished.append(matrix)
+        self.currentMovements = [movement for movement in self.currentMovements if movement.t < movement.time]
+        if transform is not None:
+            self.apply_transform(transform, finished)
+    def apply_transform(self, transform, finished=()):
+        #movements are evaluated relative to the points they started from, so those are kept in basePoints until
+        #no geometric movement is running; movements that finish early are folded into bakedTransform
+        if self.basePoints is None:
+            self.basePoints = np.array(self.pointlist)
+            self.bakedTransform = np.identity(3)
+        self.pointlist = apply_affine(np.dot(transform, self.bakedTransform), self.basePoints)
+        for matrix in finished:
+            self.bakedTransform = np.dot(matrix, self.bakedTransform)
+        if not any(getattr(movement, 'matrix', None) is not None for movement in self.currentMovements):
+            self.basePoints = None
     def update(self):
         self.move()
         #should objects in self.mobjects be updated here as well?
+    def schedule(self, movement):
+        timeline = self.getTimeline()
+        if timeline == None:  #not attached to a window yet, so the movement is stepped from now on
+            self.currentMovements.append(movement)
+        else:
+            timeline.add(movement, self)
     def rotateBy(self, angle, axis, time, delay=0, ratefunc=SmoothMove()):
-        self.currentMovements.append(
+        self.schedule(
             Rotation(
                 parent = self,
                 angle = angle,
@@ -80,7 +255,7 @@ class Mobject:
                 )
             )
     def changeColorTo(self, endColor, time, delay=0, ratefunc=ConstantRF()):
-        self.currentMovements.append(
+        self.schedule(
             ChangeColor(
                 parent = self,
                 endColor = endColor,
@@ -108,6 +283,8 @@ class Graph(Element, Mobject):
         Element.__init__(self, parent, pos, dim)
         Mobject.__init__(self, parent, **kwargs)
         self.create_axes()
+        self.axesLayer = None  #(transform, surface, rect) of the cached axes/ticks/gridlines
+        self.lastAxesTransform = None
     def toParentCoords(self, coords):
         #convert graph coordinates to fraction of total graph dimension, then convert to fraction of parent element
         xMin, xMax = self.xRange
@@ -116,6 +293,18 @@ class Graph(Element, Mobject):
         newX = (x - xMin) / (xMax - xMin) * self.dim[0] + self.pos[0]
         newY = (yMax - y) / (yMax - yMin) * self.dim[1] + self.pos[1]  #the 'yMax - y' term is different to flip the y-axis
         return np.array([newX, newY])
+    def getTransformKey(self):
+        return (tuple(self.pos), tuple(self.dim), tuple(self.xRange), tuple(self.yRange))
+    def getLocalBounds(self):
+        return (self.xRange[0], self.yRange[0], self.xRange[1], self.yRange[1])
+    def getBounds(self):
+        return bounds_union([Element.getBounds(self), self.xAxis.getBounds(), self.yAxis.getBounds()])
+    def getLocalTransform(self):
+        xMin, xMax = self.xRange
+        yMin, yMax = self.yRange
+        xScale = self.dim[0] / (xMax - xMin)
+        yScale = self.dim[1] / (yMax - yMin)
+        return affine(np.diag([xScale, -yScale]), (self.pos[0] - xMin*xScale, self.pos[1] + yMax*yScale))
     def create_axes(self):
         self.xAxis = Axis(
             parent = self,
@@ -156,17 +345,38 @@ class Graph(Element, Mobject):
         self.mobjects.append(circle)
         return circle
     def draw_axes(self):
-        self.xAxis.draw()
-        self.yAxis.draw()
+        #the axes never change in graph coordinates, so they are rendered once into an offscreen layer and
+        #blitted until the transform changes; while the camera is moving they are drawn directly instead
+        transform = self.getTransform()
+        if self.axesLayer != None and self.axesLayer[0] is transform:
+            transform, layer, rect = self.axesLayer
+            self.screen.blit(layer, rect, rect)
+        elif transform is self.lastAxesTransform:
+            self.cache_axes(transform)
+            transform, layer, rect = self.axesLayer
+            self.screen.blit(layer, rect, rect)
+        else:
+            self.axesLayer = None
+            self.xAxis.draw()
+            self.yAxis.draw()
+        self.lastAxesTransform = transform
+    def cache_axes(self, transform):
+        layer = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        self.xAxis.draw(layer)
+        self.yAxis.draw(layer)
+        self.axesLayer = (transform, layer, layer.get_bounding_rect())
     def draw_curves(self): #obsolete?
         for curve in self.curves:
             curve.draw()
         for vector in self.vectors:
             vector.draw()
     def draw(self):
+        if not self.isVisible():
+            return
         self.draw_axes()
         for mobject in self.mobjects:
-            mobject.draw()
+            if mobject.isVisible():
+                mobject.draw()
 
 class Axis(Mobject):
     params = {
@@ -174,6 +384,7 @@ class Axis(Mobject):
         'tickInterval': 1,
         'gridlineInterval': 1,
         'domain': (-10,10),
+        'tickLength': 0.1,
         'name': None
         }
 
@@ -191,34 +402,38 @@ class Axis(Mobject):
             color = self.axisColor,
             arrowLength = 0
             )
+    def get_positions(self, interval):
+        n = np.arange(self.domain[0], self.domain[1]+interval, interval)
+        n = n[n != 0]
+        return np.transpose(vec(n, self.angle))
     def create_ticks(self):
-        self.ticks = []
-        for n in np.arange(self.domain[0], self.domain[1]+self.tickInterval, self.tickInterval):
-            if n != 0:
-                self.ticks.append(Tick(
-                    parent = self,
-                    pos = vec(n, self.angle),
-                    angle = self.angle + np.pi/2,
-                    color = self.tickColor
-                    ))
+        pos = self.get_positions(self.tickInterval)
+        offset = vec(self.tickLength/2, self.angle + np.pi/2)
+        self.ticks = LineBatch(
+            parent = self,
+            starts = pos + offset,
+            ends = pos - offset,
+            width = 0.01,
+            color = self.tickColor
+            )
     def create_gridlines(self):
-        self.gridlines = []
-        for n in np.arange(self.domain[0], self.domain[1]+self.gridlineInterval, self.gridlineInterval):
-            if n!= 0:
-                self.gridlines.append(Gridline(
-                    parent = self,
-                    pos = vec(n, self.angle),
-                    angle = (self.angle + np.pi/2) % np.pi, #prevents angle being set to pi
-                    color = self.gridlineColor,
-                    domain = self.domain,
-                    extent = self.extent
-                    ))
-    def draw(self):
-        for gridline in self.gridlines:
-            gridline.draw()
-        self.axisLine.draw()
-        for tick in self.ticks:
-            tick.draw()
+        pos = self.get_positions(self.gridlineInterval)
+        angle = (self.angle + np.pi/2) % np.pi #prevents angle being set to pi
+        self.gridlines = LineBatch(
+            parent = self,
+            starts = pos + vec(self.extent[0], angle),
+            ends = pos + vec(self.extent[1], angle),
+            width = 0.01,
+            color = self.gridlineColor
+            )
+    def getBounds(self):
+        return bounds_union([self.axisLine.getBounds(), self.ticks.getBounds(), self.gridlines.getBounds()])
+    def draw(self, surface=None):
+        #ticks and gridlines are culled line by line
+        self.gridlines.draw(surface)
+        if self.axisLine.isVisible():
+            self.axisLine.draw(surface)
+        self.ticks.draw(surface)
 
 class Tick(Mobject):
     params = {
@@ -239,8 +454,8 @@ class Tick(Mobject):
                          end = end,
                          color = self.color
                          )
-    def draw(self):
-        self.line.draw()
+    def draw(self, surface=None):
+        self.line.draw(surface)
 
 class Gridline(Mobject):
     params = {
@@ -263,8 +478,8 @@ class Gridline(Mobject):
             end = end,
             color = self.color
             )
-    def draw(self):
-        self.line.draw()
+    def draw(self, surface=None):
+        self.line.draw(surface)
 
 class Line(Mobject):
     params = {
@@ -310,6 +525,9 @@ class Line(Mobject):
     def get_midpoint(self):
         return self.start + (self.end-self.start)/2
 
+    def getLocalBounds(self):
+        return bounds_of(self.vertices)
+
     def get_start_arrow_vertices(self):
         return np.array([self.start_arrow_base + self.normal_vector*self.arrowWidth,
                          self.start_arrow_base - self.normal_vector*self.arrowWidth,
@@ -328,12 +546,17 @@ class Line(Mobject):
             self.end_arrow = Triangle(params={'vertices': self.get_end_arrow_vertices(), 'color': self.color})
 
     def update(self):
-        self.pointlist = np.array([self.start, self.end])
-        self.move()   #Mobject.update(self)
-        self.start, self.end = self.pointlist
-        self.update_vertices()
-
-    def draw(self):
+        if self.currentMovements:
+            self.pointlist = np.array([self.start, self.end])
+            self.move()   #Mobject.update(self)
+            self.start, self.end = self.pointlist
+        if self.needsUpdate():
+            self.update_vertices()
+            self.markClean()
+
+    def draw(self, surface=None):
+        if surface == None:
+            surface = self.screen
         color = self.color.astype(int)
 
         if self.draw_start_arrow:
@@ -343,14 +566,9 @@ class Line(Mobject):
 
 
 
-        #converted_vertices = list(map(lambda x: parent.toPixel().astype(int), self.vertices))
-
-        convertedPoints = []
-        for vertex in self.vertices:
-            convertedPoints.append(self.parent.toPixel(vertex).astype(int))   #make it so 'toPixel' can handle arrays of coordinates
-
-        pygame.gfxdraw.aapolygon(self.screen, convertedPoints, color)
-        pygame.gfxdraw.filled_polygon(self.screen, convertedPoints, color)
+        convertedPoints = self.toPixelArray(self.vertices)
+        pygame.gfxdraw.aapolygon(surface, convertedPoints, color)
+        pygame.gfxdraw.filled_polygon(surface, convertedPoints, color)
 
         # if self.draw_start_arrow:
 
@@ -358,6 +576,63 @@ class Line(Mobject):
         # if self.draw_end_arrow:
         #     self.end_arrow.draw(graph)
 
+class LineBatch(Mobject):
+    #many plain lines (no arrows) stored as arrays, for gridlines/ticks; width and color may be per line or shared
+    params = {
+        'starts': (),
+        'ends': (),
+        'width': 0.01,
+        'color': white
+        }
+
+    def __init__(self, parent, **kwargs):
+        self.lineBoundsCache = None  #(window transform, version, (N,4) bounds of each line)
+        Mobject.__init__(self, parent, **kwargs)
+        self.update()
+
+    def update_vertices(self):
+        starts = np.reshape(self.starts, (-1,2))
+        ends = np.reshape(self.ends, (-1,2))
+        vectors = ends - starts
+        unitVectors = vectors / np.sqrt(np.sum(vectors**2, axis=1))[:,None]
+        normalVectors = np.transpose([-unitVectors[:,1], unitVectors[:,0]]) * (np.reshape(self.width, (-1,1))/2)
+        self.vertices = np.stack([ends + normalVectors, ends - normalVectors,
+                                  starts - normalVectors, starts + normalVectors], axis=1)  #same corner order as Line
+
+    def update(self):
+        if self.needsUpdate():
+            self.update_vertices()
+            self.markClean()
+        Mobject.update(self)
+
+    def getLocalBounds(self):
+        return bounds_of(self.vertices)
+
+    def getLineBounds(self):
+        transform = self.getWindowTransform()
+        if self.lineBoundsCache == None or self.lineBoundsCache[0] is not transform or self.lineBoundsCache[1] != self.version:
+            corners = apply_affine(transform, self.vertices.reshape(-1,2)).reshape(-1, 4, 2)
+            self.lineBoundsCache = (transform, self.version, np.concatenate((corners.min(axis=1), corners.max(axis=1)), axis=1))
+        return self.lineBoundsCache[2]
+
+    def get_visible(self):
+        #mask of the lines whose bounding boxes touch the camera viewport
+        bounds = self.getLineBounds()
+        xMin, yMin, xMax, yMax = self.getViewport(self.getCullMargin())
+        return (bounds[:,0] <= xMax) & (bounds[:,2] >= xMin) & (bounds[:,1] <= yMax) & (bounds[:,3] >= yMin)
+
+    def draw(self, surface=None):
+        if surface == None:
+            surface = self.screen
+        visible = self.get_visible()
+        vertices = self.vertices[visible]
+        lineCount = len(vertices)
+        convertedPoints = self.toPixelArray(vertices.reshape(-1,2)).reshape(lineCount, 4, 2)
+        colors = np.broadcast_to(np.asarray(self.color).astype(int), (len(self.vertices), 3))[visible]
+        for points, color in zip(convertedPoints, colors):
+            pygame.gfxdraw.aapolygon(surface, points, color)
+            pygame.gfxdraw.filled_polygon(surface, points, color)
+
 class Circle(Mobject):
     params = {
         'center': (0,0),
@@ -376,13 +651,13 @@ class Circle(Mobject):
             self.filled = False
 
     def update(self):
-        angles = np.linspace(0, 2*np.pi, self.resolution)
-        self.points = self.radius * np.transpose(np.array([np.cos(angles), np.sin(angles)]))
+        if self.needsUpdate():
+            angles = np.linspace(0, 2*np.pi, self.resolution)
+            self.points = self.radius * np.transpose(np.array([np.cos(angles), np.sin(angles)]))
+            self.markClean()
 
     def draw(self): #needs work
-        points = []
-        for point in self.points:
-            points.append(self.parent.toPixel(point).astype(int))
+        points = self.toPixelArray(self.points)
         if self.filled:
             gfxdraw.filled_polygon(self.screen, points, self.color)
         else:
@@ -394,23 +669,86 @@ class Curve(Mobject):
         'domain': (-np.pi, np.pi),
         'color': blue,
         'width': 2,
-        'res': 100
+        'res': 100,
+        'antialias': False,
+        'adaptive': False,  #draw from zoom-aware samples instead of the res grid (see sample_adaptive)
+        'tolerance': 0.5,  #most an adaptively sampled polyline may stray from the curve, in pixels
+        'maxRes': 2000  #sample budget for adaptive sampling
     }
+    initialSpacing = 4  #pixels between the uniform samples adaptive sampling starts from
 
     def __init__(self, parent=None, **kwargs):
+        self.samples = None  #(version, transform, pixels) of the last adaptive sampling
         Mobject.__init__(self, parent, **kwargs)
         self.update()
 
+    def evaluate(self, x):
+        #y values of the curve at an array of x values
+        return np.broadcast_to(self.func(x), np.shape(x))
+
     def update(self):
-        self.xpoints = np.linspace(self.domain[0], self.domain[1], self.res)
-        self.ypoints = self.func(self.xpoints)
+        #a func that reads other objects' state needs dependsOn(), otherwise the curve is only resampled when its params change
+        if self.needsUpdate():
+            self.xpoints = np.linspace(self.domain[0], self.domain[1], self.res)
+            self.ypoints = self.func(self.xpoints)
+            self.markClean()
         Mobject.update(self)
 
+    def getLocalBounds(self):
+        return bounds_of(np.transpose([self.xpoints, self.ypoints]))
+
+    def sample_adaptive(self, transform, domain=None):
+        #pixel polyline within 'tolerance' of the curve: starts from samples initialSpacing pixels apart along the
+        #domain and keeps halving the segments whose midpoint is too far from their chord, worst first once the
+        #maxRes budget runs short. The samples therefore follow the on-screen size (zoom) and the local curvature.
+        x0, x1 = self.domain if domain is None else domain
+        extent = np.hypot(transform[0,0], transform[1,0]) * abs(x1 - x0)
+        xs = np.linspace(x0, x1, int(np.clip(np.ceil(extent/self.initialSpacing) + 1, 2, self.maxRes)))
+        pixels = apply_affine(transform, np.transpose([xs, self.evaluate(xs)]))
+        active = np.arange(len(xs) - 1)  #segments whose midpoint hasn't been checked yet
+        while len(active) > 0 and len(xs) < self.maxRes:
+            xm = (xs[active] + xs[active+1]) / 2
+            pm = apply_affine(transform, np.transpose([xm, self.evaluate(xm)]))
+            chord = pixels[active+1] - pixels[active]
+            offset = pm - pixels[active]
+            length = np.hypot(chord[:,0], chord[:,1])
+            error = np.where(length > 0, np.abs(chord[:,0]*offset[:,1] - chord[:,1]*offset[:,0]) / np.maximum(length, 1e-12),
+                             np.hypot(offset[:,0], offset[:,1]))  #distance from the midpoint to the chord
+            split = np.flatnonzero(error > self.tolerance)
+            if len(split) > self.maxRes - len(xs):
+                split = np.sort(split[np.argsort(-error[split])[:self.maxRes - len(xs)]])
+            if len(split) == 0:
+                break
+            segments = active[split]
+            xs = np.insert(xs, segments+1, xm[split])
+            pixels = np.insert(pixels, segments+1, pm[split], axis=0)
+            first = segments + np.arange(len(segments))  #where each split segment's first half ends up
+            active = np.ravel(np.transpose([first, first+1]))
+        return pixels.astype(int)
+
+    def get_visible_domain(self):
+        #part of the domain inside the viewport's x range
+        viewport = self.getLocalViewport()
+        return (max(self.domain[0], viewport[0]), min(self.domain[1], viewport[2]))
+
+    def get_runs(self):
+        #pixel polylines of the visible parts of the curve
+        if not self.adaptive:
+            points = np.transpose(np.array([self.xpoints, self.ypoints]))
+            return [self.toPixelArray(run) for run in clip_polyline(points, self.getLocalViewport())]
+        #resampled only when the curve or its transform (camera, graph ranges) has changed; only the visible
+        #part of the domain is sampled
+        transform = self.getTransform()
+        if self.samples == None or self.samples[0] != self.version or self.samples[1] is not transform:
+            x0, x1 = self.get_visible_domain()
+            pixels = self.sample_adaptive(transform, (x0, x1)) if x0 < x1 else np.zeros((0,2), dtype=int)
+            self.samples = (self.version, transform, clip_polyline(pixels, screen_bounds(self.screen, self.getCullMargin())))
+        return self.samples[2]
+
     def draw(self):
-        points = np.transpose(np.array([self.xpoints, self.ypoints]))
-        ppixel = np.array([self.toPixel(point).astype(int) for point in points])
-        for i in range(0, self.res-1):
-            pygame.draw.line(self.screen, self.color, ppixel[i], ppixel[i+1], self.width)
+        for run in self.get_runs():
+            if len(run) > 1:
+                draw_polyline(self.screen, self.color, run, self.width, self.antialias)
 
 class Trace(Mobject):
     params = {
@@ -418,13 +756,55 @@ class Trace(Mobject):
         'domain': (-np.pi, np.pi),
         'res': 100,
         'color': blue,
-        'width': 2
+        'width': 2,
+        'antialias': False,
+        'maxlen': None  #keep only the most recent maxlen points
     }
 
     def __init__(self, parent=None, **kwargs):
+        #points live in buffer[first:end]; pixels caches their pixel coordinates up to pixelEnd
         self.points = []
         Mobject.__init__(self, parent, **kwargs)
 
+    @property
+    def points(self):
+        return self.buffer[self.first:self.end]
+
+    @points.setter
+    def points(self, points):
+        points = np.array(points, dtype=float).reshape(-1,2)
+        self.buffer = np.zeros((max(16, 2*len(points)), 2))
+        self.buffer[:len(points)] = points
+        self.pixels = np.zeros(self.buffer.shape, dtype=int)
+        self.first = 0
+        self.end = len(points)
+        self.pixelEnd = 0
+        self.pixelTransform = None
+
+    def append(self, point):
+        if self.end == len(self.buffer):
+            count = self.end - self.first
+            if count <= len(self.buffer)//2:  #reuse the space in front of the oldest point once it's at least half the buffer
+                self.buffer[:count] = self.buffer[self.first:self.end]
+                self.pixels[:count] = self.pixels[self.first:self.end]
+            else:  #grow geometrically, so with maxlen the buffer ends up at least 2*maxlen and appends stay amortized O(1)
+                size = 2*len(self.buffer)
+                self.buffer = np.concatenate((self.buffer[self.first:self.end], np.zeros((size-count, 2))))
+                self.pixels = np.concatenate((self.pixels[self.first:self.end], np.zeros((size-count, 2), dtype=int)))
+            self.pixelEnd = max(self.pixelEnd - self.first, 0)
+            self.first = 0
+            self.end = count
+        self.buffer[self.end] = point
+        self.end += 1
+        if self.maxlen != None and self.end - self.first > self.maxlen:
+            self.first += 1
+
+    def getLocalBounds(self):
+        return bounds_of(self.points)
+
+    def getBoundsKey(self):
+        return (id(self.buffer), self.first, self.end)
+
     def set_leader(self, leader):
         self.leader = leader
         leader.setParent(self)
@@ -435,15 +815,27 @@ class Trace(Mobject):
         if self.leader != None:
             self.leader.update()
             newPoint = self.leader.pos
-            if np.sqrt(np.sum((newPoint-self.points[-1])**2)) > (self.domain[1]-self.domain[0])/self.res:
-                self.points.append(newPoint)
+            if np.sqrt(np.sum((newPoint-self.buffer[self.end-1])**2)) > (self.domain[1]-self.domain[0])/self.res:
+                self.append(newPoint)
         Mobject.update(self)
 
+    def update_pixels(self):
+        #only newly appended points are converted, unless the transform has changed since the last draw
+        transform = self.getTransform()
+        start = self.first
+        if transform is self.pixelTransform:
+            start = max(self.pixelEnd, self.first)
+        self.pixels[start:self.end] = self.toPixelArray(self.buffer[start:self.end])
+        self.pixelEnd = self.end
+        self.pixelTransform = transform
+
     def draw(self):
-        if len(self.points) > 1:
-            ppixel = np.array([self.toPixel(point).astype(int) for point in np.array(self.points)])
-            pygame.draw.lines(self.screen, self.color, False, ppixel, self.width)
-        self.leader.draw()
+        if self.end - self.first > 1:
+            self.update_pixels()
+            for run in clip_polyline(self.pixels[self.first:self.end], screen_bounds(self.screen, self.getCullMargin())):
+                draw_polyline(self.screen, self.color, run, self.width, self.antialias)
+        if self.leader.isVisible():
+            self.leader.draw()
 
 
 class Point(Mobject):
@@ -459,8 +851,18 @@ class Point(Mobject):
         Mobject.__init__(self, parent, **kwargs)
 
     def update(self):
-        if self.func != None:
+        if self.func != None and self.needsUpdate():
             self.pos = self.func(1)
+            self.markClean()
+
+    def getLocalBounds(self):
+        return bounds_of(self.pos)
+
+    def getBoundsKey(self):
+        return tuple(self.pos)
+
+    def getCullMargin(self):
+        return self.cullMargin + self.radius
 
     def draw(self):
         pygame.draw.circle(self.screen, self.color, self.toPixel(self.pos).astype(int), self.radius, self.width)
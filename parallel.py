@@ -0,0 +1,70 @@
+import multiprocessing
+from collections import deque
+import pygame
+
+#Renders a scene's timeline in chunks of frames spread over worker processes.
+#A scene is any object with schedule(), update_frame(), draw_frame() and a headless window
+#(see Lagrange in euler_lagrange.py). Each worker builds its own scene with build_scene() and
+#fast-forwards it with update_frame() (no drawing) up to the first frame of its chunk.
+#With the 'fork' start method build_scene can be any callable; with 'spawn' it has to be picklable.
+
+workerState = {}
+
+
+def count_frames(scene):
+    return sum(round(frames) for segment, frames in scene.schedule())
+
+
+def scene_frames(scene):
+    #runs the scene's segment schedule, yielding once after each frame has been updated
+    for segment, frames in scene.schedule():
+        segment()
+        for i in range(round(frames)):
+            scene.update_frame()
+            yield
+
+
+def init_worker(build_scene):
+    workerState['build_scene'] = build_scene
+    workerState['scene'] = None
+
+
+def render_chunk(chunk):
+    #returns the raw RGB bytes of frames start..end-1
+    start, end = chunk
+    #chunks are handed out in order, so a worker can usually keep going with the scene it already has
+    if workerState['scene'] == None or workerState['position'] > start:
+        workerState['scene'] = workerState['build_scene']()
+        workerState['frames'] = scene_frames(workerState['scene'])
+        workerState['position'] = 0
+    scene = workerState['scene']
+    frames = []
+    while workerState['position'] < end:
+        next(workerState['frames'])
+        if workerState['position'] >= start:
+            scene.draw_frame()
+            frames.append(pygame.image.tostring(scene.window.screen, 'RGB'))
+        workerState['position'] += 1
+    return frames
+
+
+def render_parallel(build_scene, sink, workers=None, chunkSize=30):
+    #renders the whole schedule with a pool of worker processes and writes the frames to sink in order
+    #(sink=None renders without writing anything, e.g. to time the render)
+    scene = build_scene()
+    totalFrames = count_frames(scene)
+    size = scene.window.screen.get_size()
+    del scene
+
+    workers = workers or multiprocessing.cpu_count()
+    chunks = deque((start, min(start+chunkSize, totalFrames)) for start in range(0, totalFrames, chunkSize))
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(build_scene,)) as pool:
+        pending = deque()
+        while chunks or pending:
+            #keep at most two chunks per worker in flight so finished frames can't pile up in memory
+            while chunks and len(pending) < 2*workers:
+                pending.append(pool.apply_async(render_chunk, (chunks.popleft(),)))
+            for data in pending.popleft().get():
+                if sink != None:
+                    sink.write_frame(data, size)
+    return totalFrames
@@ -0,0 +1,121 @@
+import functools
+import json
+import time
+
+from camera import *
+from objects import *
+
+#Opt-in per-object timing for update/draw/step calls, exportable as a Chrome trace
+#(open the file in chrome://tracing or https://ui.perfetto.dev).
+#
+#    profiler = Profiler()
+#    profiler.install(Variation)  #any extra classes besides the ones in objects.py/camera.py/transformations.py
+#    ...render frames, calling profiler.mark_frame() after each one...
+#    profiler.uninstall()
+#    profiler.export_chrome_trace('trace.json')
+#
+#Times are inclusive: Trace.update contains the Point.update of its leader. Calls an object makes to its own
+#base class methods (Curve.update -> Mobject.update) are recorded as nested and left out of summary().
+
+def all_subclasses(cls):
+    classes = [cls]
+    for subclass in cls.__subclasses__():
+        classes.extend(all_subclasses(subclass))
+    return classes
+
+
+class Profiler:
+    methods = ('update', 'draw', 'step')
+
+    def __init__(self):
+        self.events = []
+        self.frame = 0
+        self.pid = 0
+        self.patched = []  #(class, method name, original function)
+        self.labels = {}  #id(obj) -> 'Type#n'
+        self.counts = {}
+        self.active = set()  #ids of objects with a recorded call in progress
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def install(self, *extraClasses):
+        classes = all_subclasses(Element) + all_subclasses(Mobject) + [Camera, Pan, Zoom, Rotation, ChangeColor] + list(extraClasses)
+        for cls in dict.fromkeys(classes):  #drops duplicates (Graph is both an Element and a Mobject)
+            for name in self.methods:
+                if name in cls.__dict__:
+                    original = cls.__dict__[name]
+                    setattr(cls, name, self.wrap(cls, name, original))
+                    self.patched.append((cls, name, original))
+
+    def uninstall(self):
+        for cls, name, original in reversed(self.patched):
+            setattr(cls, name, original)
+        self.patched = []
+
+    def wrap(self, cls, name, method):
+        profiler = self
+        qualname = f'{cls.__name__}.{name}'
+        @functools.wraps(method)
+        def wrapper(obj, *args, **kwargs):
+            outer = id(obj) not in profiler.active
+            if outer:
+                profiler.active.add(id(obj))
+            start = time.perf_counter()
+            try:
+                return method(obj, *args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                if outer:
+                    profiler.active.discard(id(obj))
+                profiler.record(obj, name, qualname, start, end, nested=not outer)
+        return wrapper
+
+    def get_label(self, obj):
+        key = id(obj)
+        if key not in self.labels:
+            typeName = type(obj).__name__
+            self.labels[key] = f'{typeName}#{self.counts.get(typeName, 0)}'
+            self.counts[typeName] = self.counts.get(typeName, 0) + 1
+        return self.labels[key]
+
+    def record(self, obj, name, qualname, start, end, nested=False):
+        self.events.append({
+            'name': f'{self.get_label(obj)}.{name}',
+            'cat': type(obj).__name__,
+            'ph': 'X',
+            'ts': (start - self.start) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self.pid,
+            'tid': 0,
+            'args': {'frame': self.frame, 'method': qualname, 'nested': nested}
+            })
+
+    def mark_frame(self):
+        self.events.append({'name': f'frame {self.frame}', 'ph': 'i', 's': 'p',
+                            'ts': (time.perf_counter() - self.start) * 1e6, 'pid': self.pid, 'tid': 0})
+        self.frame += 1
+
+    def name_process(self, name):
+        #labels the current pid in the trace viewer, e.g. one pid per benchmarked scene
+        self.events.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'args': {'name': name}})
+
+    def summary(self, by='cat', pid=None):
+        #total and per-frame wall time (ms) grouped by object type ('cat') or by instance ('name'),
+        #optionally only for one pid; msPerFrame assumes the frame counter was reset for that pid
+        frames = max(self.frame, 1)
+        totals = {}
+        for event in self.events:
+            if event['ph'] == 'X' and not event['args']['nested'] and pid in (None, event['pid']):
+                totals[event[by]] = totals.get(event[by], 0) + event['dur'] / 1000
+        return {key: {'ms': total, 'msPerFrame': total / frames}
+                for key, total in sorted(totals.items(), key=lambda item: -item[1])}
+
+    def export_chrome_trace(self, filename):
+        with open(filename, 'w') as file:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, file)
@@ -1,9 +1,50 @@
-class ConstantRF:
+import numpy as np
+
+#get_ds(t, T) is the speed at frame t of a T-frame movement, normalized so that it integrates to T.
+#get_s(t, T) is the integrated, normalized progress (0 at t=0, 1 at t>=T), used to evaluate a movement
+#directly at any frame instead of accumulating get_ds step by step.
+#get_ds_array/get_s_array do the same for an array of frames, and get_table returns both profiles for
+#frames 0..T, memoized in rateTables by (class, parameters, T) so movements with the same timing share them.
+#Movements look their table up once when they are created and pass it to get_progress on every frame.
+
+rateTables = {}
+
+class RateFunction:
+    def get_key(self, T):
+        return (type(self),) + tuple(sorted(vars(self).items())) + (T,)
+
+    def get_table(self, T):
+        #(ds, s) for frames 0, 1, ..., ceil(T)
+        key = self.get_key(T)
+        if key not in rateTables:
+            t = np.arange(int(np.ceil(T)) + 1)
+            rateTables[key] = (self.get_ds_array(t, T), self.get_s_array(t, T))
+        return rateTables[key]
+
+    def get_progress(self, t, T, s=None):
+        #get_s by table lookup in s = get_table(T)[1]; frames between table entries are computed directly
+        if s is None:
+            s = self.get_table(T)[1]
+        if t == int(t) and 0 <= t < len(s):
+            return s[int(t)]
+        return self.get_s(t, T)
+
+
+class ConstantRF(RateFunction):
     def get_ds(self, t, T):
         return 1
 
+    def get_s(self, t, T):
+        return min(max(t/T, 0), 1)
+
+    def get_ds_array(self, t, T):
+        return np.ones(np.shape(t))
 
-class LinearRF:
+    def get_s_array(self, t, T):
+        return np.clip(np.asarray(t)/T, 0, 1)
+
+
+class LinearRF(RateFunction):
     def __init__(self, a, b):
         self.a = a
         self.b = b
@@ -19,8 +60,38 @@ class LinearRF:
         elif T*(1-b) <= t: #< T:
             return (-m*a/b)*((1/2)*t**2-T*t)+T*(1-m*a*T/(2*b)) #this one isn't working, need to rework the math
 
+    def get_s(self, t, T): #integral of a speed profile that ramps up over a*T, holds, then ramps down over b*T
+        a = self.a
+        b = self.b
+        t = min(max(t, 0), T)
+        v = 2/(2-a-b) #top speed
+        if t < a*T:
+            return v*t**2/(2*a*T) / T
+        elif a*T <= t < T*(1-b):
+            return v*(t-a*T/2) / T
+        else:
+            return 1 - v*(T-t)**2/(2*b*T) / T
+
+    def get_ds_array(self, t, T):
+        a = self.a
+        b = self.b
+        t = np.asarray(t, dtype=float)
+        m = 2/(a*T*(2-a-b))
+        return np.select([t < a*T, t < T*(1-b)],
+                         [(1/2)*m*t**2, m*a*T*t-(m/2)*(a*T)**2],
+                         (-m*a/b)*((1/2)*t**2-T*t)+T*(1-m*a*T/(2*b)))
+
+    def get_s_array(self, t, T):
+        a = self.a
+        b = self.b
+        t = np.clip(np.asarray(t, dtype=float), 0, T)
+        v = 2/(2-a-b)
+        return np.select([t < a*T, t < T*(1-b)],
+                         [v*t**2/(2*a*T) / T, v*(t-a*T/2) / T],
+                         1 - v*(T-t)**2/(2*b*T) / T)
 
-class SmoothMove:
+
+class SmoothMove(RateFunction):
     def __init__(self, a=1/4):
         self.a = a
 
@@ -34,6 +105,30 @@ class SmoothMove:
         elif t > T-a*T:
             return (T-t)/(a*T*(1-a))
 
+    def get_s(self, t, T):
+        a = self.a
+        t = min(max(t, 0), T)
+        if t < a*T:
+            return t**2/(2*a*T*(1-a)) / T
+        elif a*T <= t <= T-a*T:
+            return (t-a*T/2)/(1-a) / T
+        else:
+            return 1 - (T-t)**2/(2*a*T*(1-a)) / T
+
+    def get_ds_array(self, t, T):
+        a = self.a
+        t = np.asarray(t, dtype=float)
+        return np.select([t < a*T, t <= T-a*T],
+                         [t/(a*T*(1-a)), np.full(t.shape, 1/(1-a))],
+                         (T-t)/(a*T*(1-a)))
+
+    def get_s_array(self, t, T):
+        a = self.a
+        t = np.clip(np.asarray(t, dtype=float), 0, T)
+        return np.select([t < a*T, t <= T-a*T],
+                         [t**2/(2*a*T*(1-a)) / T, (t-a*T/2)/(1-a) / T],
+                         1 - (T-t)**2/(2*a*T*(1-a)) / T)
+
 
 class SlowStartSlowStop(SmoothMove):
     def __init__(self):
@@ -0,0 +1,155 @@
+import os
+import queue
+import subprocess
+import threading
+import numpy as np
+import pygame
+
+
+class FrameSink:
+    #receives rendered frames from the render loop; subclasses implement write_frame for raw RGB bytes
+    ordered = True  #False if write_frame(data, size, index) may be called with frames out of order
+
+    def write(self, surface):
+        self.write_frame(pygame.image.tostring(surface, 'RGB'), surface.get_size())
+
+    def write_frame(self, data, size):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JPEGSink(FrameSink):
+    #one JPEG per frame in a folder, named by frame index (000000.jpg, 000001.jpg, ...), to be compiled
+    #afterwards with compile_video.py
+    ordered = False
+
+    def __init__(self, folder='frames', start=0):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+        self.start = start
+        self.index = start  #number of the next frame written without an explicit index
+
+    def get_filename(self, number):
+        return os.path.join(self.folder, f'{number:06d}.jpg')
+
+    def write(self, surface):
+        pygame.image.save(surface, self.get_filename(self.index))
+        self.index += 1
+
+    def write_frame(self, data, size, index=None):
+        #index counts frames from the start of this sink's stream, so writers can finish in any order
+        if index == None:
+            self.write(pygame.image.fromstring(data, size, 'RGB'))
+        else:
+            pygame.image.save(pygame.image.fromstring(data, size, 'RGB'), self.get_filename(self.start + index))
+
+
+class VideoWriterSink(FrameSink):
+    #encodes frames with OpenCV while rendering; the writer is opened on the first frame once the size is known
+    def __init__(self, filename, fps=30, fourcc='MJPG'):
+        import cv2  #optional dependency, only needed for this sink
+        self.cv2 = cv2
+        self.filename = filename
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.fps = fps
+        self.fourcc = fourcc
+        self.video = None
+
+    def write_frame(self, data, size):
+        if self.video == None:
+            self.video = self.cv2.VideoWriter(self.filename, self.cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(size[1], size[0], 3)
+        self.video.write(self.cv2.cvtColor(frame, self.cv2.COLOR_RGB2BGR))
+
+    def close(self):
+        if self.video != None:
+            self.video.release()
+            self.video = None
+
+
+class FFmpegSink(FrameSink):
+    #pipes raw RGB frames into an ffmpeg process's stdin
+    def __init__(self, filename, fps=30, codec='libx264', pixelFormat='yuv420p', ffmpeg='ffmpeg'):
+        self.filename = filename
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.fps = fps
+        self.codec = codec
+        self.pixelFormat = pixelFormat
+        self.ffmpeg = ffmpeg
+        self.process = None
+
+    def open(self, size):
+        command = [
+            self.ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{size[0]}x{size[1]}', '-r', str(self.fps), '-i', '-',
+            '-an', '-vcodec', self.codec, '-pix_fmt', self.pixelFormat, self.filename
+            ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write_frame(self, data, size):
+        if self.process == None:
+            self.open(size)
+        self.process.stdin.write(data)
+
+    def close(self):
+        if self.process != None:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise RuntimeError(f'ffmpeg exited with code {self.process.returncode} while writing {self.filename}')
+            self.process = None
+
+
+class ThreadedSink(FrameSink):
+    #hands frames to another sink on background threads so encoding and disk I/O overlap with rendering.
+    #write() only copies the pixels into a bounded queue; once maxsize frames are waiting it blocks until
+    #a writer catches up, which keeps memory bounded. More than one writer needs a sink with ordered = False.
+    def __init__(self, sink, maxsize=8, workers=1):
+        if workers > 1 and sink.ordered:
+            raise ValueError(f'{type(sink).__name__} needs its frames in order, use workers=1')
+        self.sink = sink
+        self.queue = queue.Queue(maxsize)
+        self.index = 0
+        self.error = None
+        self.threads = [threading.Thread(target=self.run, daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item == None:
+                    return
+                if self.error == None:  #after a failure the remaining frames are dropped, see check()
+                    index, data, size = item
+                    if self.sink.ordered:
+                        self.sink.write_frame(data, size)
+                    else:
+                        self.sink.write_frame(data, size, index)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        #re-raises an exception from a writer thread in the render loop
+        if self.error != None:
+            raise self.error
+
+    def write_frame(self, data, size):
+        self.check()
+        self.queue.put((self.index, data, size))
+        self.index += 1
+
+    def close(self):
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        try:
+            self.check()
+        finally:
+            self.sink.close()
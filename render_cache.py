@@ -0,0 +1,179 @@
+import hashlib
+import inspect
+import os
+import struct
+import sys
+import types
+import zlib
+import numpy as np
+
+from recording import *
+
+#On-disk cache of rendered scene segments, so re-running a scene after editing one segment only
+#re-renders the segments whose output can have changed (see Lagrange.play).
+#
+#A segment is its setup call plus the frames shown afterwards. Its key hashes everything the frames depend on,
+#described after the setup call has run: the previous segment's key (so a change carries over to every later
+#segment), the setup code, the movements waiting to run, the params of every object in the window, camera
+#position/zoom, screen size, frame count, and the source of the modules that do the drawing.
+#Frames are stored zlib-compressed, one file per segment; the least recently used files are deleted once the
+#cache grows past maxBytes.
+
+sourceModules = ['objects', 'camera', 'transformations', 'ratefunctions', 'vec2d', 'game_tools', 'timeline']
+
+
+def describe(value, depth=3):
+    #deterministic text description of a value for hashing; objects are only described down to 'depth' levels,
+    #which also stops reference cycles (a movement's parent, a lambda's closure over the scene)
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.number)):
+        return repr(value)
+    if isinstance(value, np.ndarray):
+        return f'array({value.dtype},{value.shape},{hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()})'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(describe(item, depth) for item in value) + ']'
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{describe(key, depth)}:{describe(item, depth)}' for key, item in value.items()) + '}'
+    if isinstance(value, types.CodeType):
+        return f'code({value.co_code.hex()},{describe(value.co_consts, depth)},{value.co_names})'
+    if isinstance(value, types.FunctionType):
+        #closed-over objects (usually the scene) are only named; numbers and nested functions are described fully
+        closure = [cell.cell_contents for cell in value.__closure__ or ()]
+        return f'function({describe(value.__code__, depth)},{describe(value.__defaults__, depth-1)},{describe(closure, 0)})'
+    if isinstance(value, types.MethodType):
+        return f'method({describe(value.__func__, depth)},{type(value.__self__).__qualname__})'
+    name = f'{type(value).__module__}.{type(value).__qualname__}'
+    if depth <= 0 or not hasattr(value, '__dict__') or is_scene_object(value):
+        return name
+    return name + describe(vars(value), depth-1)
+
+
+def is_scene_object(value):
+    #windows, elements, mobjects and cameras are described once through describe_tree, not wherever they're referenced
+    return any(hasattr(value, name) for name in ('params', 'elements', 'currentMovements', 'timeline'))
+
+
+def describe_tree(node):
+    #params of every Mobject and position of every Element below node, in drawing order
+    parts = [type(node).__qualname__]
+    if hasattr(node, 'params'):
+        parts.append(describe({name: getattr(node, name, None) for name in node.params}, 1))
+    if hasattr(node, 'dim'):
+        parts.append(describe((node.pos, node.dim)))
+    for child in getattr(node, 'elements', []) + getattr(node, 'mobjects', []):
+        parts.append(describe_tree(child))
+    return '(' + ';'.join(parts) + ')'
+
+
+def describe_sources(*modules):
+    hashes = []
+    for name in modules:
+        module = sys.modules.get(name)
+        if module != None and getattr(module, '__file__', None):
+            with open(inspect.getsourcefile(module), 'rb') as file:
+                hashes.append(hashlib.sha1(file.read()).hexdigest())
+    return ','.join(hashes)
+
+
+class SegmentCache:
+    def __init__(self, directory='cache', maxBytes=2*1024**3, level=1):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.level = level  #zlib compression level; rendered frames are mostly flat colour, so 1 already does well
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_key(self, scene, segment, frames, previousKey=None):
+        #call after segment() has run, so the movements it scheduled are on the timeline
+        window = scene.window
+        timeline = window.timeline
+        running = [movement for owner in [window.camera] + self.get_mobjects(scene.canvas) for movement in owner.currentMovements]
+        parts = [
+            str(previousKey),
+            describe_sources(*sourceModules, type(scene).__module__),
+            describe(getattr(segment, '__func__', segment)),
+            describe((round(frames), tuple(window.screenSize), window.camera.pos, window.camera.zoom, timeline.frame)),
+            describe([(startFrame, skippedSteps, movement) for startFrame, order, skippedSteps, movement, owner in sorted(timeline.pending, key=lambda entry: entry[:2])]),
+            describe(running),
+            describe_tree(scene.canvas)
+            ]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def get_mobjects(self, node):
+        mobjects = []
+        for child in getattr(node, 'elements', []) + getattr(node, 'mobjects', []):
+            if hasattr(child, 'currentMovements'):
+                mobjects.append(child)
+            mobjects.extend(self.get_mobjects(child))
+        return mobjects
+
+    def get_path(self, key):
+        return os.path.join(self.directory, f'{key}.seg')
+
+    def has(self, key):
+        return os.path.exists(self.get_path(key))
+
+    def read(self, key):
+        #yields (data, size) for each cached frame, raw RGB like FrameSink.write_frame receives
+        path = self.get_path(key)
+        os.utime(path)  #marks the segment as recently used
+        with open(path, 'rb') as file:
+            width, height, count = struct.unpack('<III', file.read(12))
+            for i in range(count):
+                length, = struct.unpack('<I', file.read(4))
+                yield zlib.decompress(file.read(length)), (width, height)
+
+    def recorder(self, key, sink=None):
+        return SegmentRecorder(self, key, sink)
+
+    def get_size(self):
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory) if name.endswith('.seg'))
+
+    def evict(self):
+        #deletes least recently used segments until the cache fits in maxBytes
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.seg')]
+        files.sort(key=os.path.getmtime)
+        size = sum(os.path.getsize(path) for path in files)
+        for path in files:
+            if size <= self.maxBytes:
+                break
+            size -= os.path.getsize(path)
+            os.remove(path)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.seg'):
+                os.remove(os.path.join(self.directory, name))
+
+
+class SegmentRecorder(FrameSink):
+    #stores the frames of one segment in the cache while passing them on to sink; the file only appears under
+    #its key once close() is called, so an interrupted render never leaves a partial segment behind
+    def __init__(self, cache, key, sink=None):
+        self.cache = cache
+        self.key = key
+        self.sink = sink
+        self.path = cache.get_path(key)
+        self.file = open(self.path + '.tmp', 'wb')
+        self.file.write(struct.pack('<III', 0, 0, 0))  #size and frame count are filled in on close
+        self.size = (0, 0)
+        self.count = 0
+
+    def write_frame(self, data, size):
+        compressed = zlib.compress(data, self.cache.level)
+        self.file.write(struct.pack('<I', len(compressed)))
+        self.file.write(compressed)
+        self.size = size
+        self.count += 1
+        if self.sink != None:
+            self.sink.write_frame(data, size)
+
+    def close(self):
+        #finishes the cache file; the downstream sink stays open for the following segments
+        self.file.seek(0)
+        self.file.write(struct.pack('<III', self.size[0], self.size[1], self.count))
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+        self.cache.evict()
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path + '.tmp')
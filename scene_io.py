@@ -0,0 +1,276 @@
+import importlib
+import json
+import marshal
+import mmap
+import struct
+import sys
+import types
+from functools import partial
+import numpy as np
+import pygame
+
+#Binary scene format, replacing pickle for save/load (game_tools.save/load use it).
+#
+#  save_scene('scene.bin', scene)
+#  scene = load_scene('scene.bin')
+#
+#Layout: 8 byte magic, header length (uint64), a JSON header describing the object graph, then the raw bytes
+#of every numpy array, each block aligned to 64 bytes. load_scene memory-maps the file copy-on-write, so the
+#arrays are used in place without being read or copied until something writes to them, which makes loading a
+#prepared scene in a render worker cheap:
+#
+#  render_parallel(functools.partial(load_scene, 'scene.bin'), sink)
+#
+#Objects are stored by reference (shared objects and cycles survive a round trip) and rebuilt without calling
+#__init__. Lists, tuples and dicts are stored by value. Module level functions and classes are stored by name;
+#lambdas and nested functions as marshalled code plus their module, defaults and closure, so a file is only
+#readable by the Python version that wrote it. Classes and functions defined in a script run as __main__ can't
+#be saved, since loading them would mean importing the script and running its top level code again. Surfaces are stored as their pixels and clocks are recreated. As with pickle, only load files you trust: loading runs stored code.
+
+magic = b'SCENE01\0'
+alignment = 64
+
+
+def resolve(module, qualname):
+    value = importlib.import_module(module)
+    for name in qualname.split('.'):
+        value = getattr(value, name)
+    return value
+
+
+def find_by_name(value):
+    #(module, qualname) if value can be imported by name, otherwise None
+    module, qualname = getattr(value, '__module__', None), getattr(value, '__qualname__', '')
+    if module == None or '<' in qualname:
+        return None
+    try:
+        if resolve(module, qualname) is value:
+            return (module, qualname)
+    except (ImportError, AttributeError):
+        pass
+    return None
+
+
+def check_not_main(value, description):
+    if getattr(value, '__module__', None) == '__main__':
+        raise TypeError(f'Cannot save {description}: it is defined in the script being run (__main__), move it into a module')
+
+
+def align(offset):
+    return -(-offset // alignment) * alignment
+
+
+class SceneWriter:
+    def __init__(self):
+        self.objects = []  #header entries; a reference is an index into this list
+        self.refs = {}  #id(obj) -> index
+        self.keepAlive = []  #keeps encoded objects alive so their ids aren't reused while writing
+        self.arrays = []
+        self.arrayRefs = {}  #id(array) -> index into self.arrays, so shared arrays stay shared
+        self.offset = 0
+
+    def add_array(self, array):
+        if id(array) not in self.arrayRefs:
+            self.arrays.append(np.ascontiguousarray(array))
+            self.arrayRefs[id(array)] = len(self.arrays) - 1
+            self.keepAlive.append(array)
+        return self.arrayRefs[id(array)]
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, str)) or type(value) == float:
+            return value
+        if isinstance(value, list):
+            return [self.encode(item) for item in value]
+        if isinstance(value, tuple):
+            return {'tuple': [self.encode(item) for item in value]}
+        if isinstance(value, dict):
+            return {'dict': [[self.encode(key), self.encode(item)] for key, item in value.items()]}
+        if isinstance(value, (set, frozenset)):
+            return {type(value).__name__: [self.encode(item) for item in value]}
+        if isinstance(value, complex):
+            return {'complex': [value.real, value.imag]}
+        if isinstance(value, bytes):
+            return {'bytes': self.add_array(np.frombuffer(value, dtype=np.uint8))}
+        if isinstance(value, np.generic):
+            return {'scalar': value.dtype.str, 'value': self.encode(value.item())}
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                return {'objects': [self.encode(item) for item in value.ravel()], 'shape': value.shape}
+            return {'array': self.add_array(value)}
+        if isinstance(value, pygame.Rect):
+            return {'rect': list(value)}
+        return {'ref': self.add_object(value)}
+
+    def add_object(self, value):
+        if id(value) in self.refs:
+            return self.refs[id(value)]
+        index = len(self.objects)
+        self.refs[id(value)] = index
+        self.keepAlive.append(value)
+        self.objects.append(None)
+        self.objects[index] = self.describe(value)
+        return index
+
+    def describe(self, value):
+        if isinstance(value, pygame.Surface):
+            #pixels are kept too, since some surfaces are caches (Graph.axesLayer) that aren't redrawn every frame
+            alpha = bool(value.get_flags() & pygame.SRCALPHA)
+            pixels = np.frombuffer(pygame.image.tostring(value, 'RGBA' if alpha else 'RGB'), dtype=np.uint8)
+            return {'surface': value.get_size(), 'alpha': alpha, 'depth': value.get_bitsize(),
+                    'display': value is pygame.display.get_surface(), 'pixels': self.add_array(pixels)}
+        if isinstance(value, type(pygame.time.Clock())):
+            return {'clock': True}
+        if isinstance(value, (type, types.FunctionType)):
+            check_not_main(value, repr(value))
+        if hasattr(value, '__qualname__') and find_by_name(value):  #classes, module level and cached functions
+            return {'name': find_by_name(value)}
+        if isinstance(value, (type, types.BuiltinFunctionType)):
+            raise TypeError(f'Cannot save {value!r}: it is not importable by name')
+        if isinstance(value, partial):
+            return {'partial': self.encode(value.func), 'args': self.encode(value.args), 'keywords': self.encode(value.keywords)}
+        if isinstance(value, types.FunctionType):
+            return {
+                'code': self.add_array(np.frombuffer(marshal.dumps(value.__code__), dtype=np.uint8)),
+                'module': value.__module__,
+                'defaults': self.encode(value.__defaults__),
+                'kwdefaults': self.encode(value.__kwdefaults__),
+                'closure': [self.encode(cell.cell_contents) for cell in value.__closure__ or ()]
+                }
+        if isinstance(value, types.MethodType):
+            return {'method': value.__func__.__name__, 'self': self.encode(value.__self__)}
+        if hasattr(value, '__dict__') and not isinstance(value, types.ModuleType):
+            check_not_main(type(value), f'an instance of {type(value).__qualname__}')
+            name = find_by_name(type(value))
+            if name == None:
+                raise TypeError(f'Cannot save an instance of {type(value).__qualname__}: the class is not importable by name')
+            return {'class': name, 'state': self.encode(vars(value))}
+        raise TypeError(f'Cannot save objects of type {type(value).__qualname__}')
+
+    def write(self, filename, root):
+        root = self.encode(root)
+        blocks = []
+        for array in self.arrays:
+            blocks.append({'dtype': array.dtype.str, 'shape': array.shape, 'offset': self.offset})
+            self.offset = align(self.offset + array.nbytes)
+        header = json.dumps({
+            'python': list(sys.version_info[:2]),
+            'root': root,
+            'objects': self.objects,
+            'arrays': blocks
+            }).encode()
+        dataStart = align(len(magic) + 8 + len(header))
+        with open(filename, 'wb') as file:
+            file.write(magic + struct.pack('<Q', len(header)) + header)
+            for array, block in zip(self.arrays, blocks):
+                file.seek(dataStart + block['offset'])
+                file.write(array.data)
+            file.truncate(dataStart + self.offset)
+
+
+class SceneReader:
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            if file.read(len(magic)) != magic:
+                raise ValueError(f"'{filename}' is not a scene file")
+            headerLength, = struct.unpack('<Q', file.read(8))
+            self.header = json.loads(file.read(headerLength))
+            dataStart = align(len(magic) + 8 + headerLength)
+            #copy-on-write map: loaded arrays can be modified without touching the file
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY) if self.header['arrays'] else None
+        self.dataStart = dataStart
+        self.arrays = {}
+        self.values = {}  #reference index -> rebuilt object
+
+    def get_array(self, index):
+        if index not in self.arrays:
+            block = self.header['arrays'][index]
+            dtype = np.dtype(block['dtype'])
+            count = int(np.prod(block['shape']))
+            if count == 0:
+                array = np.empty(block['shape'], dtype)
+            else:
+                array = np.frombuffer(self.buffer, dtype, count, self.dataStart + block['offset']).reshape(block['shape'])
+            self.arrays[index] = array
+        return self.arrays[index]
+
+    def decode(self, value):
+        if not isinstance(value, (list, dict)):
+            return value
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        kind, data = next(iter(value.items()))
+        if kind == 'tuple':
+            return tuple(self.decode(item) for item in data)
+        if kind == 'dict':
+            return {self.decode(key): self.decode(item) for key, item in data}
+        if kind == 'set':
+            return set(self.decode(item) for item in data)
+        if kind == 'frozenset':
+            return frozenset(self.decode(item) for item in data)
+        if kind == 'complex':
+            return complex(*data)
+        if kind == 'bytes':
+            return self.get_array(data).tobytes()
+        if kind == 'scalar':
+            return np.dtype(data).type(self.decode(value['value']))
+        if kind == 'objects':
+            array = np.empty(len(data), dtype=object)
+            array[:] = [self.decode(item) for item in data]
+            return array.reshape(value['shape'])
+        if kind == 'array':
+            return self.get_array(data)
+        if kind == 'rect':
+            return pygame.Rect(data)
+        if kind == 'ref':
+            return self.get_object(data)
+        raise ValueError(f"Unknown entry '{kind}' in scene file")
+
+    def get_object(self, index):
+        if index in self.values:
+            return self.values[index]
+        entry = self.header['objects'][index]
+        if 'surface' in entry:
+            size, format = entry['surface'], 'RGBA' if entry['alpha'] else 'RGB'
+            pixels = pygame.image.fromstring(self.get_array(entry['pixels']).tobytes(), size, format)
+            if entry['alpha'] and not entry['display']:
+                value = pixels  #already a per-pixel alpha surface; blitting would blend instead of copy
+            else:
+                value = pygame.display.set_mode(size) if entry['display'] else pygame.Surface(size, 0, entry['depth'])
+                value.blit(pixels, (0,0))
+        elif 'clock' in entry:
+            value = pygame.time.Clock()
+        elif 'name' in entry:
+            value = resolve(*entry['name'])
+        elif 'code' in entry:
+            if tuple(self.header['python']) != sys.version_info[:2]:
+                raise ValueError(f"Scene contains code saved by Python {'.'.join(map(str, self.header['python']))}")
+            code = marshal.loads(self.get_array(entry['code']).tobytes())
+            cells = tuple(types.CellType() for name in code.co_freevars)
+            value = types.FunctionType(code, vars(importlib.import_module(entry['module'])), code.co_name, None, cells)
+            self.values[index] = value  #before decoding the closure, which may refer back to this function
+            value.__defaults__ = self.decode(entry['defaults'])
+            value.__kwdefaults__ = self.decode(entry['kwdefaults'])
+            for cell, contents in zip(cells, entry['closure']):
+                cell.cell_contents = self.decode(contents)
+        elif 'partial' in entry:
+            value = partial(self.decode(entry['partial']), *self.decode(entry['args']), **self.decode(entry['keywords']))
+        elif 'method' in entry:
+            value = getattr(self.decode(entry['self']), entry['method'])
+        else:
+            cls = resolve(*entry['class'])
+            value = cls.__new__(cls)
+            self.values[index] = value
+            vars(value).update(self.decode(entry['state']))  #bypasses __setattr__ hooks such as Mobject's dirty flag
+        self.values[index] = value
+        return value
+
+    def read(self):
+        return self.decode(self.header['root'])
+
+
+def save_scene(filename, root):
+    SceneWriter().write(filename, root)
+
+
+def load_scene(filename):
+    return SceneReader(filename).read()
@@ -0,0 +1,23 @@
+import os
+import sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from camera import *
+from objects import *
+
+
+def test_delayed_pan_starts_where_the_camera_is():
+    window = Window(screenSize=(200,100), headless=True)
+    camera = Camera(window=window, pos=(0.5,0.5), zoom=1)
+    camera.panTo((0.2,0.2), time=10)
+    camera.panTo((0.8,0.8), time=10, delay=10)
+    positions = []
+    for i in range(22):
+        window.timeline.update()
+        camera.update()
+        positions.append(camera.pos[0])
+    assert np.max(np.abs(np.diff(positions))) < 0.1
+    assert np.isclose(positions[-1], 0.8)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+import numpy as np
+
+from scene_io import *
+from transformations import Rotation
+
+
+def test_round_trip(tmp_path):
+    scale = 3
+    scene = {'func': lambda x: scale*x, 'points': np.arange(6.0).reshape(3,2), 'movement': Rotation(None, 1, 10)}
+    save_scene(tmp_path/'scene.bin', scene)
+    loaded = load_scene(tmp_path/'scene.bin')
+    assert loaded['func'](2) == 6
+    assert np.array_equal(loaded['points'], scene['points'])
+    assert isinstance(loaded['movement'], Rotation)
+
+
+def test_objects_from_main_are_refused(tmp_path):
+    #run as a script so the class and function are defined in __main__
+    script = tmp_path/'script.py'
+    script.write_text(
+        'import sys\n'
+        f'sys.path.insert(0, {root!r})\n'
+        'from scene_io import save_scene\n'
+        'class Sink:\n'
+        '    pass\n'
+        'def func(x):\n'
+        '    return x\n'
+        'for value in (Sink(), Sink, func, lambda x: x):\n'
+        '    try:\n'
+        f'        save_scene({str(tmp_path/"scene.bin")!r}, value)\n'
+        '    except TypeError as error:\n'
+        '        print("__main__" in str(error))\n'
+        )
+    output = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['True']*4
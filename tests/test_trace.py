@@ -0,0 +1,35 @@
+import os
+import sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from objects import Trace
+
+
+def test_maxlen_keeps_latest_points_past_capacity():
+    trace = Trace(maxlen=10)
+    trace.points = [(0,0)]*2
+    for i in range(1, 16):
+        trace.append((i,0))
+    assert list(trace.points[:,0]) == list(range(6, 16))
+
+
+def test_maxlen_survives_repeated_growth_and_compaction():
+    trace = Trace(maxlen=25)
+    trace.points = []
+    for i in range(1000):
+        trace.append((i,-i))
+        expected = np.arange(max(0, i-24), i+1)
+        assert np.array_equal(trace.points[:,0], expected)
+        assert np.array_equal(trace.points[:,1], -expected)
+    assert len(trace.buffer) <= 4*25
+
+
+def test_unbounded_trace_keeps_every_point():
+    trace = Trace(maxlen=None)
+    trace.points = [(0,0)]
+    for i in range(1, 100):
+        trace.append((i,i))
+    assert list(trace.points[:,0]) == list(range(100))
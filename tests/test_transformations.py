@@ -0,0 +1,26 @@
+import os
+import sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from camera import *
+from objects import *
+
+
+def test_delayed_color_change_starts_from_the_current_color():
+    window = Window(screenSize=(200,100), headless=True)
+    camera = Camera(window=window, pos=(0.5,0.5), zoom=1)
+    canvas = Element(parent=window, pos=(0,0), dim=(1,1))
+    line = Line(parent=canvas, color=red)
+    line.changeColorTo(green, time=10)
+    line.changeColorTo(blue, time=10, delay=10)
+    colors = []
+    for i in range(21):
+        window.timeline.update()
+        line.update()
+        colors.append(np.array(line.color, dtype=float))
+    assert np.allclose(colors[9], green, atol=1)
+    assert np.max(np.abs(np.diff(colors, axis=0))) < 100
+    assert np.allclose(colors[-1], blue, atol=1)
@@ -0,0 +1,28 @@
+import heapq
+import numpy as np
+
+class Timeline:
+    #central schedule for the movements of a scene (one per Window).
+    #Movements wait in a priority queue until their start frame and are only then handed to their owner
+    #(Camera or Mobject), whose currentMovements list therefore only holds movements that are running.
+    def __init__(self):
+        self.frame = 0  #index of the next frame to be updated
+        self.pending = []  #heap of (startFrame, order, skippedSteps, movement, owner)
+        self.order = 0  #keeps movements that start on the same frame in the order they were scheduled
+
+    def add(self, movement, owner):
+        #a movement starting at t=-delay becomes active on the step where t reaches 0, and finishes on the
+        #step where t reaches its time; the steps before that are skipped instead of stepped
+        skippedSteps = max(int(np.ceil(-movement.t - 1)), 0)
+        movement.startFrame = self.frame + skippedSteps
+        movement.endFrame = self.frame + max(int(np.ceil(movement.time - movement.t - 1)), skippedSteps)
+        heapq.heappush(self.pending, (movement.startFrame, self.order, skippedSteps, movement, owner))
+        self.order += 1
+
+    def update(self):
+        #call once per frame, before the camera and elements are updated
+        while self.pending and self.pending[0][0] <= self.frame:
+            startFrame, order, skippedSteps, movement, owner = heapq.heappop(self.pending)
+            movement.t += skippedSteps
+            owner.currentMovements.append(movement)
+        self.frame += 1
@@ -1,6 +1,10 @@
 from ratefunctions import *
+from vec2d import *
+from game_tools import *
 
 class Rotation:
+    #doesn't move any points itself: each step sets self.matrix, and the parent's move() composes the matrices
+    #of all its active geometric movements and applies them to its points in one go
     def __init__(self, parent, angle, time, delay=0, axis=(0,0), ratefunc=SmoothMove()):
         self.parent = parent
         self.angle = angle
@@ -8,48 +12,52 @@ class Rotation:
         self.delay = delay
         self.axis = axis
         self.ratefunc = ratefunc
-        self.step_angle = self.angle/self.time
+        self.progress = ratefunc.get_table(time)[1]
+        self.matrix = None  #affine matrix for the current frame, relative to the points when the rotation started
         self.t = -self.delay
 
-    def rotate(self, angle):
-        rotatedPoints = []
-        for point in self.parent.pointlist:
-            rotatedPoints.append(rotate(np.array(point)-self.axis, angle)+self.axis) #note that this second 'rotate' function is from vec2d.py
-        self.parent.pointlist = rotatedPoints
+    def evaluate(self, t):
+        if t >= 0:
+            self.matrix = rotation(self.angle*self.ratefunc.get_progress(t, self.time, self.progress), self.axis)
 
     def step(self):
         self.t += 1
-        if self.t >= 0:
-            ds = self.ratefunc.get_ds(self.t, self.time)
-            self.rotate(self.step_angle*ds)
+        self.evaluate(self.t)
 
 
 class ChangeColor:
     def __init__(self, parent, endColor, time, delay=0, ratefunc=ConstantRF()):
         self.parent = parent
         self.time = time
-        self.startColor = RGBtoHSV(np.array(self.parent.color)) #assume that object colors are always RGB (for now!)
+        self.startColor = None  #wait until after delay to read the starting color
         if endColor[0] > 255 or type(endColor[1]) != int or type(endColor[2]) != int:
             self.endColor = np.array(endColor) #assume input is HSV
         else:
             self.endColor = RGBtoHSV(np.array(endColor)) #assume input is RGB
         self.ratefunc = ratefunc
-        self.colorChange = self.endColor - self.startColor
-        self.stepSize = self.colorChange / self.time
+        self.progress = ratefunc.get_table(time)[1]
+        self.ramp = None
         self.t = -delay
 
-    def fade(self, step):
-        c1 = RGBtoHSV(self.parent.color)
-        c2 = c1 + step
-        self.parent.color = HSVtoRGB(c2)
-        for i in range(3):
-            if self.parent.color[i] > 255:
-                self.parent.color[i] = 255
-            elif self.parent.color[i] < 0:
-                self.parent.color[i] = 0
+    def create_ramp(self):
+        #RGB color at each frame 0..ceil(time), so evaluating a frame is just an index into this array
+        self.startColor = RGBtoHSV(np.array(self.parent.color)) #assume that object colors are always RGB (for now!)
+        self.colorChange = self.endColor - self.startColor
+        s = self.progress
+        self.ramp = np.clip(HSVtoRGB_array(self.startColor + self.colorChange*s[:,None]), 0, 255)
+
+    def fade(self, s):
+        self.parent.color = np.clip(HSVtoRGB(self.startColor + self.colorChange*s), 0, 255)
+
+    def evaluate(self, t):
+        if t >= 0:
+            if self.ramp is None:
+                self.create_ramp()
+            if t == int(t) and t < len(self.ramp):
+                self.parent.color = self.ramp[int(t)].copy()
+            else:  #t isn't one of the frames the ramp was built for
+                self.fade(self.ratefunc.get_progress(t, self.time, self.progress))
 
     def step(self):
         self.t += 1
-        if self.t >= 0 and self.t < self.time:
-            ds = self.ratefunc.get_ds(self.t, self.time)
-            self.fade(self.stepSize*ds)
+        self.evaluate(self.t)
@@ -26,3 +26,72 @@ def rotate(u, theta):
     matrix = np.array([[np.cos(theta), -np.sin(theta)],
                        [np.sin(theta), np.cos(theta)]])
     return np.dot(matrix, u)
+
+def affine(linear, offset=(0,0)):
+    #3x3 matrix mapping [x, y, 1] -> [x', y', 1]
+    matrix = np.identity(3)
+    matrix[:2,:2] = linear
+    matrix[:2,2] = offset
+    return matrix
+
+def apply_affine(matrix, points):
+    #works on a single point or an (N,2) array of points
+    return np.dot(points, matrix[:2,:2].T) + matrix[:2,2]
+
+def rotation(theta, axis=(0,0)):
+    #affine matrix rotating by theta about axis
+    linear = np.array([[np.cos(theta), -np.sin(theta)],
+                       [np.sin(theta), np.cos(theta)]])
+    return affine(linear, np.array(axis) - np.dot(linear, axis))
+
+#bounding boxes are (xMin, yMin, xMax, yMax); None stands for unknown bounds, which overlap everything
+
+def bounds_of(points):
+    points = np.reshape(points, (-1,2))
+    if len(points) == 0:
+        return None
+    low, high = points.min(axis=0), points.max(axis=0)
+    if not (np.isfinite(low).all() and np.isfinite(high).all()):  #ignore points with nan/inf coordinates
+        points = points[np.all(np.isfinite(points), axis=1)]
+        if len(points) == 0:
+            return None
+        low, high = points.min(axis=0), points.max(axis=0)
+    return (*low.tolist(), *high.tolist())
+
+def transform_bounds(matrix, bounds):
+    #bounds of the transformed box (exact for the axis-aligned scalings used by graphs, conservative otherwise)
+    if bounds is None:
+        return None
+    xMin, yMin, xMax, yMax = bounds
+    (a, b, c), (d, e, f) = matrix[:2].tolist()
+    if b == 0 and d == 0:  #no rotation: plain floats are much faster than numpy for four corners
+        x0, x1, y0, y1 = a*xMin + c, a*xMax + c, e*yMin + f, e*yMax + f
+        return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+    return bounds_of(apply_affine(matrix, np.array([[xMin, yMin], [xMax, yMin], [xMin, yMax], [xMax, yMax]])))
+
+def bounds_union(boundsList):
+    boundsList = list(boundsList)
+    if any(bounds is None for bounds in boundsList):
+        return None
+    return (min(bounds[0] for bounds in boundsList), min(bounds[1] for bounds in boundsList),
+            max(bounds[2] for bounds in boundsList), max(bounds[3] for bounds in boundsList))
+
+def bounds_overlap(a, b):
+    if a is None or b is None:
+        return True
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def clip_polyline(points, bounds):
+    #splits an (N,2) polyline into the runs of consecutive segments whose bounding boxes touch bounds;
+    #segments entirely outside are dropped, so what is left draws the same inside bounds
+    if bounds is None or len(points) < 2:
+        return [points]
+    x, y = points[:,0], points[:,1]
+    visible = ((np.minimum(x[:-1], x[1:]) <= bounds[2]) & (np.maximum(x[:-1], x[1:]) >= bounds[0])
+               & (np.minimum(y[:-1], y[1:]) <= bounds[3]) & (np.maximum(y[:-1], y[1:]) >= bounds[1]))
+    if visible.all():
+        return [points]
+    edges = np.diff(np.concatenate(([0], visible.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  #run of segments starts..ends-1 covers points starts..ends
+    return [points[start:end+1] for start, end in zip(starts, ends)]